@@ -0,0 +1,151 @@
+#===================================================================
+# file: bench.py
+# desc: transaction count / wire byte benchmark for the i2c drivers.
+#       runs every high level operation against the simulated bus,
+#       reports bus cost per call and fails if an operation got more
+#       expensive than its stored baseline.
+# dev : nos
+# usage:
+#   python bench.py              # run and compare against baselines.json
+#   python bench.py --update     # store the current numbers as baseline
+#   python bench.py -k pcf8574   # only operations matching a substring
+#===================================================================
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+from i2c.sim import NosI2CSim, SimPCA9685, SimPCF8574, SimPCF8591
+
+from pca9685 import PCA9685
+from pcf8574 import PCF8574
+from pcf8591 import PCF8591
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+# counters compared against the baseline. anything else is informational
+CHECKED = ("ioctls", "bytes")
+
+
+def _pca9685():
+    sim = NosI2CSim(devices=[SimPCA9685(0x40)])
+    return sim, PCA9685(0x40, i2c=sim)
+
+def _pcf8574():
+    sim = NosI2CSim(devices=[SimPCF8574(0x20)])
+    return sim, PCF8574(0x20, i2c=sim)
+
+def _pcf8591():
+    sim = NosI2CSim(devices=[SimPCF8591(0x48)])
+    return sim, PCF8591(0x48, i2c=sim)
+
+
+# name -> (setup, op(dev, i)). op is called with an increasing i so
+# consecutive calls change something and can't be skipped as no-ops
+OPS: Dict[str, Tuple[Callable, Callable]] = {
+    "pca9685.set_duty_cycle": (_pca9685, lambda d, i: d.set_duty_cycle(i % 16, i % 100)),
+    "pca9685.set_duty_cycles[16]": (_pca9685, lambda d, i: d.set_duty_cycles({ch: (i + ch) % 100 for ch in range(16)})),
+    # full 16 channel frame where two channels change per call
+    "pca9685.frame.commit":   (_pca9685, lambda d, i: d.frame.set_duty_cycles({ch: i % 90 + 5 if ch == i % 16 else 5 for ch in range(16)}).commit()),
+    "pca9685.get_duty_cycle": (_pca9685, lambda d, i: d.get_duty_cycle(i % 16)),
+    "pca9685.get_all_duty_cycles": (_pca9685, lambda d, i: d.get_all_duty_cycles()),
+    "pca9685.set_freq":       (_pca9685, lambda d, i: d.set_freq(50 + i % 2 * 50)),
+    "pcf8574.set_state":      (_pcf8574, lambda d, i: d.set_state(i % 8, i // 8 % 2)),
+    "pcf8574.set_pins":       (_pcf8574, lambda d, i: d.set_pins(0x0F, i)),
+    "pcf8574.stream[64]":     (_pcf8574, lambda d, i: d.stream(bytes([i & 0xFF, 0x0F]) * 32)),
+    "pcf8574.get_state":      (_pcf8574, lambda d, i: d.get_state()),
+    "pcf8591.get_voltage":    (_pcf8591, lambda d, i: d.get_voltage(i % 4)),
+    "pcf8591.get_all":        (_pcf8591, lambda d, i: d.get_all()),
+    "pcf8591.set_voltage":    (_pcf8591, lambda d, i: d.set_voltage(i % 50 / 10)),
+}
+
+
+def run(name: str, n: int = 200) -> Dict[str, float]:
+    """
+    Benchmark one operation.
+
+    Args:
+        name (str): Key of OPS.
+        n (int): Calls to average over.
+
+    Returns:
+        Dict[str, float]: Per call: ioctls, messages, bytes, wire time at
+            100/400 kHz in us and Python time in us (driver + simulator).
+    """
+    setup, op = OPS[name]
+    sim, dev = setup()
+    op(dev, 0)  # warm up, first call may prime caches
+    sim.clock.reset()
+
+    t = time.perf_counter()
+    for i in range(1, n + 1): op(dev, i)
+    t = time.perf_counter() - t
+
+    c = sim.clock
+    return {
+        "ioctls": c.ioctls / n,
+        "messages": c.messages / n,
+        "bytes": c.bytes / n,
+        "us@100k": c.clocks / n / 100_000 * 1e6,
+        "us@400k": c.clocks / n / 400_000 * 1e6,
+        "py_us": t / n * 1e6,
+    }
+
+
+def compare(results: Dict[str, Dict[str, float]], baselines: Dict[str, Dict[str, float]]) -> Tuple[List[str], List[str]]:
+    """ (regressions, improvements) as printable lines """
+    worse, better = [], []
+    for name, res in results.items():
+        base = baselines.get(name)
+        if base is None:
+            better.append("%s: no baseline" % name)
+            continue
+        for k in CHECKED:
+            if res[k] > base[k] + 1e-9:
+                worse.append("%s: %s %g -> %g" % (name, k, base[k], res[k]))
+            elif res[k] < base[k] - 1e-9:
+                better.append("%s: %s %g -> %g" % (name, k, base[k], res[k]))
+    return worse, better
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("-k", default="", help="only operations containing this")
+    ap.add_argument("-n", type=int, default=200, help="calls per operation")
+    ap.add_argument("--update", action="store_true", help="store results as the new baseline")
+    args = ap.parse_args(argv)
+
+    names = [k for k in OPS if args.k in k]
+    results = {k: run(k, args.n) for k in names}
+
+    cols = ("ioctls", "messages", "bytes", "us@100k", "us@400k", "py_us")
+    print("%-30s" % "operation" + "".join("%10s" % c for c in cols))
+    for k, r in results.items():
+        print("%-30s" % k + "".join("%10.1f" % r[c] for c in cols))
+
+    baselines = {}
+    if os.path.exists(BASELINES):
+        with open(BASELINES) as f: baselines = json.load(f)
+
+    if args.update:
+        for k, r in results.items(): baselines[k] = {c: r[c] for c in CHECKED}
+        with open(BASELINES, "w") as f:
+            json.dump(baselines, f, indent=4, sort_keys=True)
+            f.write("\n")
+        print("baselines updated")
+        return 0
+
+    worse, better = compare(results, baselines)
+    for line in better: print("improved   " + line)
+    for line in worse: print("REGRESSION " + line)
+    if worse:
+        print("!! %d regression(s) against %s" % (len(worse), BASELINES))
+        return 1
+    if better: print("run with --update to store the improvements")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,2 +1,18 @@
-from .core import NosI2C, NosI2CDevice
-__all__ = ["NosI2C", "NosI2CDevice"]
\ No newline at end of file
+from .core import NosI2C, NosI2CDevice, NosI2CRegistry
+from .transaction import NosI2CTransaction
+from .shadow import NosI2CShadow
+from .scheduler import NosI2CScheduler
+from .aio import NosI2CAsync
+from .scan import NosI2CWatcher, list_buses, scan_buses
+from .sim import NosI2CSim, NosI2CClock
+from .trace import NosI2CTracer
+from .singleflight import NosI2CSingleFlight
+from .grid import NosI2CGrid
+from .poller import NosI2CPoller, NosI2CSubscription
+from .group import NosI2CDeviceGroup
+__all__ = [
+    "NosI2C", "NosI2CDevice", "NosI2CRegistry", "NosI2CTransaction", "NosI2CShadow",
+    "NosI2CScheduler", "NosI2CAsync", "NosI2CWatcher", "list_buses", "scan_buses", "NosI2CSim", "NosI2CClock",
+    "NosI2CTracer", "NosI2CSingleFlight", "NosI2CGrid", "NosI2CPoller", "NosI2CSubscription",
+    "NosI2CDeviceGroup",
+]
@@ -0,0 +1,90 @@
+#===================================================================
+# file: aio.py
+# desc: asyncio front end for NosI2CDevice and the drivers built on
+#       it. calls run on the bus scheduler thread, the event loop
+#       only awaits the result.
+# dev : nos
+#===================================================================
+import asyncio
+from typing import Any, List, Optional, Sequence, Tuple
+
+
+class NosI2CAsync:
+    """
+    Awaitable proxy for a NosI2CDevice.
+
+    Any method of the wrapped device (primitives like read_reg_byte as
+    well as driver methods like PCA9685.set_duty_cycle) becomes a
+    coroutine function that runs on the bus scheduler.
+
+    Example:
+        pca = PCA9685(0x40)
+        await pca.aio.set_duty_cycle(0, 50)
+        v0, v1 = await asyncio.gather(adc.aio.get_voltage(0), adc.aio.get_voltage(1))
+
+    Attributes:
+        device (NosI2CDevice): Wrapped device.
+        priority (int | None): Scheduler priority. None uses device.priority.
+    """
+
+    def __init__(self, device, priority: Optional[int] = None):
+        """
+        Args:
+            device (NosI2CDevice): Device to wrap.
+            priority (int | None): Scheduler priority for every call.
+        """
+        self.device = device
+        self.priority: Optional[int] = priority
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.device, name)
+        if not callable(attr): return attr
+
+        async def call(*args, **kwargs):
+            return await asyncio.wrap_future(self.device.submit(attr, *args, priority=self.priority, **kwargs))
+        call.__name__ = name
+        call.__doc__ = attr.__doc__
+        return call
+
+    async def batch(self, *calls: Sequence[Any]) -> List[Any]:
+        """
+        Run several calls as one scheduler job.
+
+        Args:
+            *calls: (method name, *args) tuples, ie ("set_duty_cycle", 0, 50).
+                A trailing dict is passed as keyword arguments.
+
+        Returns:
+            List[Any]: Return value of each call, in order.
+
+        Notes:
+            - One thread hop for the whole batch, and nothing else on the bus
+              runs in between.
+        """
+        jobs: List[Tuple[Any, tuple, dict]] = []
+        for c in calls:
+            name, args = c[0], tuple(c[1:])
+            kwargs = {}
+            if args and isinstance(args[-1], dict):
+                args, kwargs = args[:-1], args[-1]
+            jobs.append((getattr(self.device, name), args, kwargs))
+
+        def run():
+            return [fn(*a, **kw) for fn, a, kw in jobs]
+        return await asyncio.wrap_future(self.device.submit(run, priority=self.priority))
+
+
+async def gather(*devices_calls: Tuple[Any, Sequence[Sequence[Any]]]) -> List[List[Any]]:
+    """
+    Run one batch per device concurrently.
+
+    Args:
+        *devices_calls: (device, [calls]) pairs. calls as in NosI2CAsync.batch.
+
+    Returns:
+        List[List[Any]]: Results per device, in order.
+
+    Notes:
+        - Devices on different buses run in parallel, each on its own bus thread.
+    """
+    return list(await asyncio.gather(*(d.aio.batch(*calls) for d, calls in devices_calls)))
@@ -7,8 +7,17 @@
 # todo :
 #   * windows
 #===================================================================
-from typing import List, Union
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Optional, Union
 import smbus2
+from .transaction import NosI2CTransaction
+from .shadow import NosI2CShadow
+from .scheduler import NosI2CScheduler, NosI2CBusLock
+from .aio import NosI2CAsync
+from .singleflight import NosI2CSingleFlight
 
 try:
     from smbus2 import SMBus
@@ -24,51 +33,262 @@ if not _HAS_I2C:
 
 class NosI2C(smbus2.SMBus):
     HAS_I2C = _HAS_I2C
+    tracer = None
     class NO_ADDR_PROVIDED(Exception):pass
 
-    @classmethod
-    def discover(cls,bus=1):
-        """ just loop reads bus. blocking """
-        import time
-        i2c = NosI2C(bus)
-        _addresses = i2c.scan()
-        print("scanned addresses: %s" % ([hex(i) for i in _addresses]))
-        while True:
-            addresses = i2c.scan()
-            if addresses == _addresses: continue
-            _addresses = addresses
-            print("scanned addresses: %s" % ([hex(i) for i in _addresses]))
-            time.sleep(1)
+    # 0x00-0x07 and 0x78-0x7f are reserved by the i2c spec
+    SCAN_FIRST: int = 0x08
+    SCAN_LAST: int = 0x77
+    # standard mode. assumed when the adapter doesn't report its clock
+    DEF_FREQ: int = 100_000
+    _freq: Optional[int] = None
 
+    @classmethod
+    def discover(cls,bus=1,interval=1.0):
+        """ print devices as they come and go. blocking """
+        from .scan import NosI2CWatcher
+        w = NosI2CWatcher(
+            bus, interval=interval, backoff=1,
+            on_add=lambda b,a: print("found %s" % hex(a)),
+            on_remove=lambda b,a: print("lost %s" % hex(a)),
+        )
+        print("watching /dev/i2c-%d" % bus)
+        try:
+            w.run()
+        except KeyboardInterrupt:
+            pass
 
     def __init__(self,bus=1):
         """ NosI2C """
+        # hold to run a sequence of calls without other threads interleaving.
+        # waiters get the bus by priority, see NosI2CBusLock
+        self.lock = NosI2CBusLock()
         super().__init__(bus)
+        self.bus_id = bus
     
-    def scan(self):
-        """ scan for devices on bus """
-        res = []
-        for a in range(0x7f):
+    def probe(self, addr: int, mode: str = "auto") -> bool:
+        """
+        Check if a device acks the address.
+
+        Args:
+            addr (int): 7-bit address.
+            mode (str): "quick" (write_quick), "read" (read_byte) or
+                "auto" (read for eeprom/write-only ranges, quick otherwise. like i2cdetect).
+        """
+        if mode == "auto":
+            mode = "read" if 0x30 <= addr <= 0x37 or 0x50 <= addr <= 0x5f else "quick"
+        try:
+            if mode == "quick":
+                self.write_quick(addr)
+            else:
+                self.read_byte(addr)
+            return True
+        except OSError:
+            return False
+
+    def scan(self, addrs=None, mode: str = "auto", reserved: bool = False) -> List[int]:
+        """
+        Scan for devices on bus.
+
+        Args:
+            addrs (Iterable[int] | None): Addresses to probe. None probes the whole bus.
+            mode (str): Probe method, see probe(). "read" is the old behaviour.
+            reserved (bool): Also probe reserved addresses 0x00-0x07 and 0x78-0x7f.
+
+        Returns:
+            List[int]: Addresses that acked, ascending.
+        """
+        if addrs is None: addrs = range(0x00, 0x80)
+        lo, hi = (0x00, 0x7f) if reserved else (self.SCAN_FIRST, self.SCAN_LAST)
+        return [a for a in sorted(set(addrs)) if lo <= a <= hi and self.probe(a, mode)]
+
+    @property
+    def freq(self) -> int:
+        """
+        SCL frequency in Hz.
+
+        Notes:
+            - Read once from the device tree (clock-frequency of the adapter,
+              ie dtparam=i2c_arm_baudrate on a raspberry pi). DEF_FREQ if the
+              adapter has none.
+        """
+        if self._freq is None:
+            path = "/sys/class/i2c-adapter/i2c-%s/of_node/clock-frequency" % self.bus_id
             try:
-                self.read_byte(a)
-                res.append(a)
+                with open(path, "rb") as f:
+                    self._freq = int.from_bytes(f.read(4), "big") or self.DEF_FREQ
             except OSError:
-                pass
-        return res
-    
-    # def writeto(self,addr,data):
-    #     """ write straight to address. no register. """
-    #     m = smbus2.i2c_msg.write(addr,data)
-    #     self.i2c_rdwr(m)
-
-    # def readfrom(self,addr,nbytes=1):
-    #     """ read straight from address. no register. """
-    #     m=smbus2.i2c_msg.read(addr,nbytes)
-    #     self.i2c_rdwr(m)
-    #     return list(m)
-    
+                self._freq = self.DEF_FREQ
+        return self._freq
+
+    def sleep(self, t: float) -> None:
+        """
+        Wait for a device on this bus, ie a chip settling after reset.
+
+        Notes:
+            - Drivers wait through here instead of time.sleep(), so a
+              simulated bus can skip or model the delay.
+        """
+        time.sleep(t)
+
+    def transaction(self, addr: Optional[int] = None, chunk: Optional[int] = None) -> NosI2CTransaction:
+        """ start a combined transaction. submitted as i2c_rdwr ioctl(s) """
+        return NosI2CTransaction(self, addr, chunk)
+
+    def writeto(self,addr,data):
+        """ write straight to address. no register. """
+        self.transaction(addr).write(data).submit()
+
+    def readfrom(self,addr,nbytes=1):
+        """ read straight from address. no register. """
+        return self.transaction(addr).read(nbytes).submit()[0]
+
+    # -----------------------------
+    # tracing
+    # -----------------------------
+    def enable_tracing(self, tracer=None, size: int = 1024):
+        """
+        Record every transaction on this bus.
+
+        Args:
+            tracer (NosI2CTracer | None): Where to record. A new one if None.
+            size (int): Ring buffer length for a new tracer.
+
+        Returns:
+            NosI2CTracer: The active tracer. See dump(), export(), export_csv().
+
+        Notes:
+            - The smbus methods are wrapped on this instance only. Disabled
+              tracing leaves the plain methods in place, so it costs nothing.
+        """
+        from .trace import NosI2CTracer, TRACED
+        self.disable_tracing()
+        if tracer is None: tracer = NosI2CTracer(size)
+        for name in TRACED:
+            setattr(self, name, tracer.wrap(getattr(self, name), name, self.lock))
+        self.i2c_rdwr = tracer.wrap_rdwr(self.i2c_rdwr, self.lock)
+        self.tracer = tracer
+        return tracer
+
+    def disable_tracing(self):
+        """ remove the tracing wrappers. the tracer keeps its data """
+        from .trace import TRACED
+        for name in list(TRACED) + ["i2c_rdwr"]:
+            self.__dict__.pop(name, None)
+        self.tracer = None
+
+    def close(self):
+        """ stop the bus scheduler and poller if any, then close the bus """
+        sched = getattr(self, "scheduler", None)
+        if sched is not None: sched.stop()
+        poller = getattr(self, "poller", None)
+        if poller is not None: poller.stop()
+        super().close()
+
+
+def _locked(fn):
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return fn(self, *args, **kwargs)
+    wrapper.__name__, wrapper.__doc__ = fn.__name__, fn.__doc__
+    return wrapper
+
+# smbus2 keeps the slave address as fd state between _set_address and the
+# ioctl, so threads sharing a bus must not interleave inside one call
+for _name in (
+    "write_quick", "read_byte", "write_byte", "read_byte_data", "write_byte_data",
+    "read_word_data", "write_word_data", "process_call", "read_block_data",
+    "write_block_data", "block_process_call", "read_i2c_block_data",
+    "write_i2c_block_data",
+):
+    setattr(NosI2C, _name, _locked(getattr(smbus2.SMBus, _name)))
+
+
+def _prioritized(fn):
+    # direct driver calls wait for the bus at the device's priority too,
+    # not only jobs that go through the scheduler
+    def wrapper(self, *args, **kwargs):
+        with self.prioritized():
+            return fn(self, *args, **kwargs)
+    wrapper.__name__, wrapper.__doc__ = fn.__name__, fn.__doc__
+    return wrapper
+
+
+class NosI2CRegistry:
+    """
+    Process wide registry of shared NosI2C buses.
+
+    Devices created without an explicit ``i2c=`` get their bus from here,
+    so every device on /dev/i2c-N shares one file descriptor and one lock.
+
+    Attributes:
+        buses (Dict[int, NosI2C]): Open buses by bus number.
+        refs (Dict[int, int]): Number of holders per bus.
+        factory (Callable[[int], NosI2C]): Creates a bus. Swap to back the
+            registry with something other than the kernel driver.
+    """
+    _lock = threading.Lock()
+    buses: Dict[int, NosI2C] = {}
+    refs: Dict[int, int] = {}
+    factory = NosI2C
+
+    @classmethod
+    def acquire(cls, bus: int = 1) -> NosI2C:
+        """
+        Get the shared NosI2C for a bus, opening it on first use.
+
+        Args:
+            bus (int): Bus number, ie 1 for /dev/i2c-1.
+
+        Returns:
+            NosI2C: Shared bus. Give it back with release().
+        """
+        with cls._lock:
+            i2c = cls.buses.get(bus)
+            if i2c is None:
+                i2c = cls.buses[bus] = cls.factory(bus)
+                cls.refs[bus] = 0
+            cls.refs[bus] += 1
+            return i2c
+
+    @classmethod
+    def release(cls, i2c: NosI2C) -> None:
+        """
+        Give back a bus from acquire(). Closed when the last holder releases it.
+
+        Args:
+            i2c (NosI2C): Bus returned by acquire().
+        """
+        with cls._lock:
+            bus = i2c.bus_id
+            if cls.buses.get(bus) is not i2c: return
+            cls.refs[bus] -= 1
+            if cls.refs[bus] > 0: return
+            del cls.buses[bus], cls.refs[bus]
+        i2c.close()
+
+    @classmethod
+    def close_all(cls) -> None:
+        """ close every registered bus no matter who still holds it """
+        with cls._lock:
+            buses = list(cls.buses.values())
+            cls.buses.clear()
+            cls.refs.clear()
+        for i2c in buses: i2c.close()
+
+
 class NosI2CDevice:
     DEF_ADDR = None
+    # registers the device changes on its own. never cached by the shadow
+    VOLATILE_REGS: tuple = ()
+    # device advances its register pointer on block access
+    AUTO_INCREMENT: bool = True
+    # priority of this device's scheduler jobs and bus lock waits
+    PRIORITY: int = NosI2CScheduler.PRIO_NORMAL
+    shadow: Optional[NosI2CShadow] = None
+    # share identical concurrent reads, see coalesce_reads()
+    coalesce: bool = False
+    max_staleness: float = 0.0
     class NO_ADDR_PROVIDED(Exception):pass
     def __init__(self,addr=None,**kwargs):
         if addr==None and self.DEF_ADDR==None: raise NosI2CDevice.NO_ADDR_PROVIDED
@@ -76,45 +296,296 @@ class NosI2CDevice:
         if addr: self.addr=addr
         
         i2c=kwargs.pop("i2c",None)
+        bus=kwargs.pop("bus",1)
+        self._shared = not i2c
         if i2c: 
             self.i2c=i2c       
         else:
-            self.i2c = NosI2C()
+            self.i2c = NosI2CRegistry.acquire(bus)
+        self.priority = kwargs.pop("priority",self.PRIORITY)
+        if kwargs.pop("shadow",False): self.enable_shadow()
+        if kwargs.pop("coalesce",False): self.coalesce_reads(max_staleness=kwargs.pop("max_staleness",0.0))
         self.init(kwargs=kwargs)
     
     def init(self, **kwargs):
         return
-    
+
+    def close(self):
+        """ flush the shadow and release the bus if it came from the registry """
+        self.flush()
+        if self._shared:
+            self._shared = False
+            NosI2CRegistry.release(self.i2c)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @contextmanager
+    def locked(self):
+        """ context holding the bus lock at this device's priority. for sequences that must not interleave """
+        lock = getattr(self.i2c, "lock", None)
+        if lock is None:
+            yield
+            return
+        with self.prioritized(), lock:
+            yield
+
+    def prioritized(self):
+        """ context running the calling thread's bus accesses at this device's priority """
+        at = getattr(getattr(self.i2c, "lock", None), "at", None)
+        return nullcontext() if at is None else at(self.priority)
+
+    # -----------------------------
+    # scheduler
+    # -----------------------------
+    @property
+    def scheduler(self) -> NosI2CScheduler:
+        """ the worker of the bus this device is on """
+        return NosI2CScheduler.for_bus(self.i2c)
+
+    def submit(self, fn, *args, priority: Optional[int] = None, **kwargs) -> Future:
+        """
+        Run fn(*args, **kwargs) as one atomic job on the bus worker.
+
+        Args:
+            fn (Callable): Usually a bound method of this device, ie dev.get_analog.
+            priority (int | None): Scheduler priority. Defaults to self.priority.
+
+        Returns:
+            Future: Resolves to the return value of fn.
+        """
+        if priority is None: priority = self.priority
+        return self.scheduler.submit(fn, *args, priority=priority, **kwargs)
+
+    def call(self, fn, *args, priority: Optional[int] = None, **kwargs):
+        """ submit() and wait for the result """
+        if priority is None: priority = self.priority
+        return self.scheduler.call(fn, *args, priority=priority, **kwargs)
+
+    @property
+    def aio(self) -> NosI2CAsync:
+        """ asyncio view of this device. ie await dev.aio.read_reg_byte(0x01) """
+        aio = self.__dict__.get("_aio")
+        if aio is None: aio = self._aio = NosI2CAsync(self)
+        return aio
+
+    def poll(self, reg: int, rate: float, callback, length: int = 1):
+        """
+        Poll a register range periodically on the bus poller thread.
+
+        Args:
+            reg (int): First register.
+            rate (float): Polls per second.
+            callback (Callable): callback(value). int for length 1, else a list.
+            length (int): Bytes to read.
+
+        Returns:
+            NosI2CSubscription: Handle, cancel() to stop.
+        """
+        from .poller import NosI2CPoller
+        return NosI2CPoller.for_bus(self.i2c).subscribe(self, reg, rate, callback, length)
+
+    def transaction(self, chunk: Optional[int] = None) -> NosI2CTransaction:
+        """ start a combined transaction addressed to this device, at its priority """
+        return NosI2CTransaction(self.i2c, self.addr, chunk, self.priority)
+
+    # -----------------------------
+    # read coalescing
+    # -----------------------------
+    def coalesce_reads(self, enable: bool = True, max_staleness: float = 0.0):
+        """
+        Share identical concurrent reads between threads.
+
+        Args:
+            enable (bool): Turn coalescing on or off.
+            max_staleness (float): Also reuse a result that finished at most
+                this many seconds ago. 0 only shares reads still in flight.
+
+        Notes:
+            - Keyed per bus and address, so separate device objects at the
+              same address share too.
+            - Any write through this device drops finished results, and
+              reads in flight during it are not reused after it.
+        """
+        self.coalesce = enable
+        self.max_staleness = max_staleness
+
+    def coalesced(self, key: tuple, fn):
+        """
+        Run a read through the bus single-flight table when coalescing is on.
+
+        Notes:
+            - A caller already holding the bus reads on its own. Waiting
+              for a leader that waits for the bus would never end.
+        """
+        if not self.coalesce: return fn()
+        owned = getattr(getattr(self.i2c, "lock", None), "owned", None)
+        if owned is not None and owned(): return fn()
+        return NosI2CSingleFlight.for_bus(self.i2c).do((self.addr,)+key, fn, self.max_staleness)
+
+    def _wrote(self):
+        """ device state changed. results of earlier reads are stale. call after the write """
+        if self.coalesce: NosI2CSingleFlight.for_bus(self.i2c).forget(self.addr)
+
+    @contextmanager
+    def _writing(self):
+        """ context around a write. reads from before it are retired once it is done, or failed """
+        try:
+            yield
+        finally:
+            self._wrote()
+
+    # -----------------------------
+    # register shadow
+    # -----------------------------
+    def enable_shadow(self, volatile=None, write_through: bool = True) -> NosI2CShadow:
+        """
+        Keep a host side copy of the registers.
+
+        Args:
+            volatile (Iterable[int] | None): Registers that always go to the wire.
+                Defaults to VOLATILE_REGS.
+            write_through (bool): Write changes immediately (True) or only on flush() (False).
+
+        Returns:
+            NosI2CShadow: The shadow now used by this device.
+
+        Notes:
+            - Reads of non-volatile registers are served from memory once known.
+            - Writes that don't change the cached value are skipped.
+        """
+        if volatile is None: volatile = self.VOLATILE_REGS
+        self.shadow = NosI2CShadow(volatile=volatile, write_through=write_through)
+        return self.shadow
+
+    def disable_shadow(self):
+        """ flush pending writes and go back to always hitting the wire """
+        if self.shadow is None: return
+        self.flush()
+        self.shadow = None
+
+    @_prioritized
+    def flush(self):
+        """
+        Write every dirty shadow register.
+
+        Notes:
+            - Contiguous dirty registers are merged into block writes,
+              all sent in one combined transaction.
+            - Devices without AUTO_INCREMENT get one write per register.
+        """
+        if self.shadow is None: return
+        blocks = self.shadow.take()
+        if not blocks: return
+        try:
+            with self._writing():
+                if len(blocks)==1 and len(blocks[0][1])==1:
+                    reg, values = blocks[0]
+                    self.i2c.write_byte_data(self.addr, reg, values[0])
+                    return
+                t = self.transaction()
+                for reg, values in blocks:
+                    if self.AUTO_INCREMENT:
+                        t.write_reg(reg, values)
+                    else:
+                        for i, v in enumerate(values): t.write_reg(reg+i, [v])
+                t.submit()
+        except OSError:
+            # device state unknown now
+            for reg, values in blocks: self.shadow.invalidate(reg, len(values))
+            raise
+
+    @contextmanager
+    def deferred(self):
+        """ stage writes in the shadow and flush them once on exit """
+        if self.shadow is None: self.enable_shadow()
+        prev = self.shadow.write_through
+        self.shadow.write_through = False
+        try:
+            yield self
+        finally:
+            self.shadow.write_through = prev
+            self.flush()
+
+    # -----------------------------
+    # access
+    # -----------------------------
+    @_prioritized
     def read_byte(self) -> int:
         """ read one byte directly. no register pointer """
+        if self.coalesce:
+            return self.coalesced(("byte",), lambda: self.i2c.read_byte(self.addr))
         return self.i2c.read_byte(self.addr)
     
+    @_prioritized
     def read_reg_byte(self, reg:int, amnt=1)->int:
         """ read byte(s) from given register """
+        if self.shadow is not None:
+            cached = self.shadow.get(reg, amnt)
+            if cached is not None:
+                return cached[0] if amnt==1 else cached
+            res = self._read_reg(reg, amnt)
+            self.shadow.load(reg, [res] if amnt==1 else res)
+            return res
+        return self._read_reg(reg, amnt)
+    def _read_reg(self, reg:int, amnt=1):
+        """ read byte(s) from given register. always on the wire, maybe shared """
+        if self.coalesce:
+            return self.coalesced(("reg",reg,amnt), lambda: self._read_reg_wire(reg,amnt))
+        return self._read_reg_wire(reg, amnt)
+    def _read_reg_wire(self, reg:int, amnt=1):
+        """ read byte(s) from given register. always on the wire """
         if amnt==1:
             return self.i2c.read_byte_data(self.addr, reg)
+        elif amnt>32:
+            # past the smbus block limit. pointer write + read in one ioctl
+            return self.transaction().read_reg(reg,amnt).submit()[0]
         else:
             return self.i2c.read_i2c_block_data(self.addr,reg,amnt)
+    @_prioritized
     def read_reg_word(self, reg:int)->int:
         """ read one word from given register. ie 2 bytes"""
         return self.i2c.read_word_data(self.addr,reg)
 
+    @_prioritized
     def write_byte(self, value:int):
         """ write byte directly. no register pointer """
-        self.i2c.write_byte(self.addr, value & 0xff)
+        with self._writing():
+            self.i2c.write_byte(self.addr, value & 0xff)
+    @_prioritized
     def write_reg_byte(self, reg:int, value: Union[int, List[int]]):
         """ write byte(s) to given register """
-        if isinstance(value,int):
-            self.i2c.write_byte_data(self.addr,reg,value&0xff)
-        elif isinstance(value,list):
-            self.i2c.write_i2c_block_data(self.addr,reg,[v&0xff for v in value])
+        if self.shadow is not None:
+            values = [value] if isinstance(value,int) else list(value)
+            if not self.shadow.is_volatile(reg, len(values)):
+                if self.shadow.stage(reg, values) and self.shadow.write_through:
+                    self.flush()
+                return
+            self.shadow.invalidate(reg, len(values))
+        self._write_reg(reg, value)
+    def _write_reg(self, reg:int, value: Union[int, List[int]]):
+        """ write byte(s) to given register. always on the wire """
+        with self._writing():
+            if isinstance(value,int):
+                self.i2c.write_byte_data(self.addr,reg,value&0xff)
+            elif isinstance(value,list) and len(value)>32:
+                # past the smbus block limit
+                self.transaction().write_reg(reg,value).submit()
+            elif isinstance(value,list):
+                self.i2c.write_i2c_block_data(self.addr,reg,[v&0xff for v in value])
+    @_prioritized
     def write_reg_word(self,reg:int, value:int):
         """ write one word to given register """
-        self.i2c.write_word_data(self, reg, value&0xffff)
+        if self.shadow is not None: self.shadow.invalidate(reg, 2)
+        with self._writing():
+            self.i2c.write_word_data(self.addr, reg, value&0xffff)
     
 
 if __name__ == "__main__":
     NosI2C.discover()
     
 
-    
\ No newline at end of file
+    
@@ -0,0 +1,102 @@
+#===================================================================
+# file: grid.py
+# desc: absolute deadline grid for fixed rate loops. shared by the
+#       poller, the PCF8591 sampler and the PCA9685 motion engine.
+# dev : nos
+#===================================================================
+import time
+from typing import Callable, Optional
+
+
+class NosI2CGrid:
+    """
+    Frame timing on an absolute deadline grid.
+
+    Frame k is due at start + k * period, so the rate never drifts with
+    the time the frames take. A frame that runs past the next deadline
+    does not trigger a burst of catch-up frames, the missed ones are
+    skipped and counted instead.
+
+    Example:
+        grid = NosI2CGrid(1 / rate)
+        while grid.wait(stop.wait):
+            grid.begin()
+            work()
+            grid.end()
+
+    Attributes:
+        period (float): Seconds between frames.
+        deadline (float): Monotonic time the next frame is due.
+        frames (int): Frames run.
+        overruns (int): Frames skipped because a frame ran past the next deadline.
+        jitter (float): Start of the last frame after its deadline, seconds.
+        jitter_total (float): Sum of jitter over all frames.
+        jitter_max (float): Worst jitter.
+        busy_max (float): Longest frame, seconds.
+    """
+
+    def __init__(self, period: float, start: Optional[float] = None):
+        """
+        Args:
+            period (float): Seconds between frames.
+            start (float | None): Monotonic time of the first frame. Now if None.
+        """
+        assert period > 0, "period must be > 0"
+        self.period: float = period
+        self.deadline: float = time.monotonic() if start is None else start
+        self.frames: int = 0
+        self.overruns: int = 0
+        self.jitter: float = 0.0
+        self.jitter_total: float = 0.0
+        self.jitter_max: float = 0.0
+        self.busy_max: float = 0.0
+        self._begin: float = 0.0
+
+    def resume(self) -> None:
+        """ after idling off the grid, make the next frame due now at the earliest """
+        self.deadline = max(self.deadline, time.monotonic())
+
+    def wait(self, waiter: Callable[[float], bool]) -> bool:
+        """
+        Wait until the next frame is due.
+
+        Args:
+            waiter (Callable[[float], bool]): waiter(seconds) blocks up to
+                seconds and returns True to abort, ie threading.Event.wait.
+                Called with 0 when the frame is already due.
+
+        Returns:
+            bool: True when the frame is due, False if aborted.
+        """
+        return not waiter(max(0.0, self.deadline - time.monotonic()))
+
+    def begin(self) -> float:
+        """
+        Mark the start of a frame.
+
+        Returns:
+            float: Jitter, seconds the frame started after its deadline.
+        """
+        self._begin = time.monotonic()
+        self.jitter = self._begin - self.deadline
+        self.frames += 1
+        self.jitter_total += self.jitter
+        if self.jitter > self.jitter_max: self.jitter_max = self.jitter
+        return self.jitter
+
+    def end(self) -> int:
+        """
+        Mark the end of a frame and move to the next deadline.
+
+        Returns:
+            int: Frames skipped because this one ran late.
+        """
+        end = time.monotonic()
+        if end - self._begin > self.busy_max: self.busy_max = end - self._begin
+        self.deadline += self.period
+        if end <= self.deadline: return 0
+        # missed one or more frames. skip them, stay on the grid
+        missed = int((end - self.deadline) / self.period) + 1
+        self.overruns += missed
+        self.deadline += missed * self.period
+        return missed
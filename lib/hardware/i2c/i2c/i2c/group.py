@@ -0,0 +1,135 @@
+#===================================================================
+# file: group.py
+# desc: devices spread over several buses driven as one. work is
+#       split per bus and every bus runs its share on its own
+#       scheduler thread, so independent buses run in parallel.
+# dev : nos
+#===================================================================
+import asyncio
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from .scheduler import NosI2CScheduler
+
+# (device, method name or callable, *args)
+Op = Sequence[Any]
+
+
+class NosI2CDeviceGroup:
+    """
+    Group of NosI2CDevice, possibly on different buses.
+
+    Example:
+        group = NosI2CDeviceGroup([PCA9685(0x40, bus=1), PCA9685(0x40, bus=3), PCA9685(0x41, bus=4)])
+        group.batch([(pca, "set_duty_cycle", ch, 50) for pca in group for ch in range(16)])
+
+    Attributes:
+        devices (List[NosI2CDevice]): Members, in insertion order.
+    """
+
+    def __init__(self, devices: Iterable = ()):
+        """
+        Args:
+            devices (Iterable[NosI2CDevice]): Initial members.
+        """
+        self.devices: List = list(devices)
+
+    def __iter__(self):
+        return iter(self.devices)
+
+    def __len__(self) -> int:
+        return len(self.devices)
+
+    def add(self, device) -> None:
+        """ add a member """
+        if device not in self.devices: self.devices.append(device)
+
+    def remove(self, device) -> None:
+        """ remove a member """
+        self.devices.remove(device)
+
+    def buses(self) -> Dict[int, List]:
+        """ members per bus, keyed by bus_id """
+        res: Dict[int, List] = {}
+        for d in self.devices:
+            res.setdefault(getattr(d.i2c, "bus_id", id(d.i2c)), []).append(d)
+        return res
+
+    # -----------------------------
+    # fan out
+    # -----------------------------
+    def submit(self, ops: Iterable[Op], priority: Optional[int] = None) -> List[Future]:
+        """
+        Split ops per bus and queue one job per bus.
+
+        Args:
+            ops (Iterable): (device, method, *args) tuples. method is a name or a
+                callable taking the device first. A trailing dict is passed as kwargs.
+            priority (int | None): Scheduler priority. Defaults to the priority of
+                the first device of each bus.
+
+        Returns:
+            List[Future]: One per bus. Each resolves to [(index, result or exception)].
+        """
+        per_bus: Dict[int, Tuple[Any, List[Tuple[int, Callable, tuple, dict]]]] = {}
+        for i, op in enumerate(ops):
+            dev, fn, args = op[0], op[1], tuple(op[2:])
+            kwargs = {}
+            if args and isinstance(args[-1], dict):
+                args, kwargs = args[:-1], args[-1]
+            fn = getattr(dev, fn) if isinstance(fn, str) else (lambda f, d: lambda *a, **k: f(d, *a, **k))(fn, dev)
+            per_bus.setdefault(id(dev.i2c), (dev, []))[1].append((i, fn, args, kwargs))
+
+        def run(jobs):
+            res = []
+            for i, fn, args, kwargs in jobs:
+                try:
+                    res.append((i, fn(*args, **kwargs)))
+                except Exception as e:
+                    res.append((i, e))
+            return res
+
+        futs = []
+        for first, jobs in per_bus.values():
+            prio = first.priority if priority is None else priority
+            futs.append(NosI2CScheduler.for_bus(first.i2c).submit(run, jobs, priority=prio))
+        return futs
+
+    @staticmethod
+    def _collect(parts: List[List[Tuple[int, Any]]]) -> List[Any]:
+        flat = sorted((p for part in parts for p in part), key=lambda p: p[0])
+        for _, r in flat:
+            if isinstance(r, Exception): raise r
+        return [r for _, r in flat]
+
+    def batch(self, ops: Iterable[Op], priority: Optional[int] = None, timeout: Optional[float] = None) -> List[Any]:
+        """
+        Run ops on all buses in parallel and wait until every bus is done.
+
+        Args:
+            ops (Iterable): See submit().
+            priority (int | None): Scheduler priority.
+            timeout (float | None): Max seconds to wait per bus.
+
+        Returns:
+            List[Any]: Result of every op, in input order.
+
+        Notes:
+            - Ops for the same bus run in order as one atomic job.
+            - If any op failed, its exception is raised after all buses finished.
+        """
+        return self._collect([f.result(timeout) for f in self.submit(ops, priority)])
+
+    async def abatch(self, ops: Iterable[Op], priority: Optional[int] = None) -> List[Any]:
+        """ awaitable batch() """
+        futs = self.submit(ops, priority)
+        return self._collect(list(await asyncio.gather(*(asyncio.wrap_future(f) for f in futs))))
+
+    def call(self, method: Union[str, Callable], *args, priority: Optional[int] = None, **kwargs) -> List[Any]:
+        """
+        Call the same method with the same arguments on every member.
+
+        Returns:
+            List[Any]: Result per member, in member order.
+        """
+        return self.batch([(d, method) + args + ((kwargs,) if kwargs else ()) for d in self.devices], priority)
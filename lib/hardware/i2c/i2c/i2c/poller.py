@@ -0,0 +1,248 @@
+#===================================================================
+# file: poller.py
+# desc: periodic register polling. one thread per bus runs every
+#       subscription, grouped by rate, with adjacent registers merged
+#       into block reads and a whole frame sent as one transaction.
+# dev : nos
+#===================================================================
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .grid import NosI2CGrid
+from .shadow import coalesce
+from .transaction import NosI2CTransaction
+
+
+class NosI2CSubscription:
+    """
+    One polled register range.
+
+    Attributes:
+        device (NosI2CDevice): Device polled.
+        reg (int): First register.
+        length (int): Bytes read.
+        period (float): Seconds between reads.
+        callback (Callable): callback(value). value is an int for length 1, else a list.
+        active (bool): False once cancelled.
+    """
+
+    def __init__(self, poller: "NosI2CPoller", device, reg: int, length: int, period: float, callback: Callable):
+        self.poller = poller
+        self.device = device
+        self.reg: int = reg
+        self.length: int = length
+        self.period: float = period
+        self.callback: Callable = callback
+        self.active: bool = True
+
+    def cancel(self) -> None:
+        """ stop polling this range """
+        self.poller.unsubscribe(self)
+
+
+class _RateGroup(NosI2CGrid):
+    """ subscriptions sharing a period, on their own deadline grid """
+
+    def __init__(self, period: float, start: float):
+        super().__init__(period, start)
+        self.subs: List[NosI2CSubscription] = []
+        self.errors: int = 0
+        self.last_error: Optional[BaseException] = None
+
+
+class NosI2CPoller:
+    """
+    Rate grouped poller for one bus.
+
+    Subscriptions with the same rate form a group with one absolute
+    deadline per frame. Due groups run shortest period first (rate
+    monotonic). Within a frame, ranges of the same device that touch or
+    overlap are merged into one block read (devices with AUTO_INCREMENT
+    only) and all reads go out as a single combined transaction.
+
+    Attributes:
+        i2c (NosI2C): Bus polled.
+        merge_gap (int): Unsubscribed registers allowed between merged ranges.
+    """
+    _lock = threading.Lock()
+
+    @classmethod
+    def for_bus(cls, i2c) -> "NosI2CPoller":
+        """ the poller attached to a bus, created and started on first use """
+        with cls._lock:
+            poller = getattr(i2c, "poller", None)
+            if poller is None:
+                poller = i2c.poller = cls(i2c)
+            poller.start()
+            return poller
+
+    def __init__(self, i2c, merge_gap: int = 0):
+        """
+        Args:
+            i2c (NosI2C): Bus to poll.
+            merge_gap (int): Unsubscribed registers allowed between merged ranges.
+        """
+        self.i2c = i2c
+        self.merge_gap: int = merge_gap
+        self._groups: Dict[float, _RateGroup] = {}
+        self._cv = threading.Condition()
+        self._stop = False
+        self._thread: Optional[threading.Thread] = None
+
+    # -----------------------------
+    # subscriptions
+    # -----------------------------
+    def subscribe(self, device, reg: int, rate: float, callback: Callable, length: int = 1) -> NosI2CSubscription:
+        """
+        Poll a register range at a fixed rate.
+
+        Args:
+            device (NosI2CDevice): Device on this bus.
+            reg (int): First register.
+            rate (float): Polls per second.
+            callback (Callable): callback(value) after every poll, on the poller thread.
+            length (int): Bytes to read.
+
+        Returns:
+            NosI2CSubscription: Handle, cancel() to stop.
+        """
+        assert rate > 0, "rate must be > 0"
+        assert length > 0, "length must be > 0"
+        period = 1.0 / rate
+        sub = NosI2CSubscription(self, device, reg, length, period, callback)
+        with self._cv:
+            g = self._groups.get(period)
+            if g is None:
+                g = self._groups[period] = _RateGroup(period, time.monotonic())
+            g.subs.append(sub)
+            self._cv.notify()
+        return sub
+
+    def unsubscribe(self, sub: NosI2CSubscription) -> None:
+        """ stop polling a subscription """
+        with self._cv:
+            sub.active = False
+            g = self._groups.get(sub.period)
+            if g is None or sub not in g.subs: return
+            g.subs.remove(sub)
+            if not g.subs: del self._groups[sub.period]
+
+    # -----------------------------
+    # thread
+    # -----------------------------
+    def start(self) -> "NosI2CPoller":
+        """ start the poller thread (non-blocking) """
+        if self._thread is not None and self._thread.is_alive(): return self
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, daemon=True, name="i2c-poll-%s" % getattr(self.i2c, "bus_id", "?"))
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """ stop the poller thread """
+        with self._cv:
+            self._stop = True
+            self._cv.notify()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            with self._cv:
+                while not self._stop:
+                    if self._groups:
+                        wait = min(g.deadline for g in self._groups.values()) - time.monotonic()
+                        if wait <= 0: break
+                        self._cv.wait(wait)
+                    else:
+                        self._cv.wait()
+                if self._stop: return
+                now = time.monotonic()
+                # rate monotonic. shortest period first
+                due = sorted((g for g in self._groups.values() if g.deadline <= now), key=lambda g: g.period)
+                frames = [(g, list(g.subs)) for g in due]
+            for g, subs in frames:
+                self._frame(g, subs)
+
+    def _frame(self, g: _RateGroup, subs: List[NosI2CSubscription]) -> None:
+        g.begin()
+        try:
+            self.read(subs)
+        except Exception as e:
+            # keep polling. the error is counted and kept for stats
+            g.errors += 1
+            g.last_error = e
+        g.end()
+
+    def plan(self, subs: List[NosI2CSubscription]) -> List[Tuple[object, int, int]]:
+        """
+        Merge subscriptions into reads.
+
+        Returns:
+            List[Tuple[NosI2CDevice, int, int]]: (device, first register, length) per read.
+        """
+        by_dev: Dict[int, Tuple[object, List[NosI2CSubscription]]] = {}
+        for s in subs:
+            by_dev.setdefault(id(s.device), (s.device, []))[1].append(s)
+        reads = []
+        for dev, dsubs in by_dev.values():
+            if not dev.AUTO_INCREMENT:
+                regs = sorted({r for s in dsubs for r in range(s.reg, s.reg + s.length)})
+                reads.extend((dev, r, 1) for r in regs)
+                continue
+            regs = {r for s in dsubs for r in range(s.reg, s.reg + s.length)}
+            reads.extend((dev, start, n) for start, n in coalesce(regs, self.merge_gap))
+        return reads
+
+    def read(self, subs: List[NosI2CSubscription]) -> None:
+        """
+        Poll the given subscriptions once, as one transaction, and fire callbacks.
+
+        Notes:
+            - Each device queues its reads on its own transaction(), so
+              device setup (ie PCA9685 auto-increment) runs first.
+        """
+        reads = self.plan(subs)
+        if not reads: return
+        # the frame waits for the bus at its most urgent device's priority
+        t = NosI2CTransaction(self.i2c, priority=min(d.priority for d, _, _ in reads))
+        # plan() keeps the reads of a device together
+        dev, td = None, None
+        for d, reg, n in reads:
+            if d is not dev:
+                if td is not None: t.extend(td)
+                dev, td = d, d.transaction()
+            td.read_reg(reg, n)
+        t.extend(td)
+        data: Dict[Tuple[int, int], int] = {}
+        for (dev, reg, n), values in zip(reads, t.submit()):
+            for i, v in enumerate(values): data[(id(dev), reg + i)] = v
+
+        for s in subs:
+            if not s.active: continue
+            values = [data[(id(s.device), r)] for r in range(s.reg, s.reg + s.length)]
+            s.callback(values[0] if s.length == 1 else values)
+
+    def stats(self) -> Dict[float, Dict[str, float]]:
+        """
+        Timing per rate group.
+
+        Returns:
+            Dict[float, Dict[str, float]]: {rate Hz: {"subs", "frames", "overruns",
+                "errors", "jitter_mean", "jitter_max", "busy_max", "last_error"}}, times in seconds.
+        """
+        with self._cv:
+            return {
+                1.0 / g.period: {
+                    "subs": len(g.subs),
+                    "frames": g.frames,
+                    "overruns": g.overruns,
+                    "errors": g.errors,
+                    "jitter_mean": g.jitter_total / g.frames if g.frames else 0.0,
+                    "jitter_max": g.jitter_max,
+                    "busy_max": g.busy_max,
+                    "last_error": g.last_error,
+                }
+                for g in self._groups.values()
+            }
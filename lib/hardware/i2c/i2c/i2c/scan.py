@@ -0,0 +1,151 @@
+#===================================================================
+# file: scan.py
+# desc: bus scanning across several /dev/i2c-* and a hot plug
+#       watcher with add/remove callbacks.
+# dev : nos
+# os :
+#   * linux
+#===================================================================
+import glob
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .core import NosI2CRegistry
+
+
+def list_buses() -> List[int]:
+    """ bus numbers of every /dev/i2c-* on this system """
+    res = []
+    for path in glob.glob("/dev/i2c-*"):
+        try:
+            res.append(int(path.rsplit("-", 1)[1]))
+        except ValueError:
+            pass
+    return sorted(res)
+
+
+def scan_buses(buses: Optional[Iterable[int]] = None, **kwargs) -> Dict[int, List[int]]:
+    """
+    Scan several buses in parallel. One thread per bus.
+
+    Args:
+        buses (Iterable[int] | None): Bus numbers. None scans every /dev/i2c-*.
+        **kwargs: Passed to NosI2C.scan, ie mode="quick" or addrs=range(0x20, 0x28).
+
+    Returns:
+        Dict[int, List[int]]: Responding addresses per bus. Buses that fail to open are left out.
+    """
+    buses = list_buses() if buses is None else list(buses)
+
+    def one(bus):
+        try:
+            i2c = NosI2CRegistry.acquire(bus)
+        except OSError:
+            return bus, None
+        try:
+            return bus, i2c.scan(**kwargs)
+        finally:
+            NosI2CRegistry.release(i2c)
+
+    if not buses: return {}
+    with ThreadPoolExecutor(max_workers=len(buses)) as ex:
+        return {bus: res for bus, res in ex.map(one, buses) if res is not None}
+
+
+class NosI2CWatcher:
+    """
+    Background hot plug watcher for one bus.
+
+    Rescans periodically and calls on_add/on_remove for every address
+    that appeared/disappeared. While nothing changes the interval grows
+    by ``backoff`` up to ``max_interval``; any change resets it.
+
+    Attributes:
+        bus (int): Bus number.
+        addresses (List[int]): Addresses seen on the last scan.
+        interval (float): Base seconds between scans.
+        max_interval (float): Upper bound for the backed off interval.
+        backoff (float): Interval multiplier after a scan with no change.
+    """
+
+    def __init__(
+        self,
+        bus: int = 1,
+        on_add: Optional[Callable[[int, int], None]] = None,
+        on_remove: Optional[Callable[[int, int], None]] = None,
+        interval: float = 1.0,
+        max_interval: float = 10.0,
+        backoff: float = 2.0,
+        **scan_kwargs
+    ):
+        """
+        Args:
+            bus (int): Bus number to watch.
+            on_add (Callable | None): on_add(bus, addr) when a device shows up.
+            on_remove (Callable | None): on_remove(bus, addr) when a device goes away.
+            interval (float): Base seconds between scans.
+            max_interval (float): Max seconds between scans.
+            backoff (float): Interval growth factor while idle. 1 disables backoff.
+            **scan_kwargs: Passed to NosI2C.scan.
+        """
+        assert interval > 0, "interval must be > 0"
+        self.bus: int = bus
+        self.on_add = on_add
+        self.on_remove = on_remove
+        self.interval: float = interval
+        self.max_interval: float = max(interval, max_interval)
+        self.backoff: float = max(1.0, backoff)
+        self.scan_kwargs = scan_kwargs
+        self.addresses: List[int] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> "NosI2CWatcher":
+        """ start watching (non-blocking) """
+        if self.running: return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, daemon=True, name="i2c-watch-%d" % self.bus)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """ stop watching and wait for the thread """
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def poll(self, i2c) -> bool:
+        """
+        Scan once and fire callbacks.
+
+        Returns:
+            bool: True if anything changed.
+        """
+        now = i2c.scan(**self.scan_kwargs)
+        added = [a for a in now if a not in self.addresses]
+        removed = [a for a in self.addresses if a not in now]
+        self.addresses = now
+        if self.on_add:
+            for a in added: self.on_add(self.bus, a)
+        if self.on_remove:
+            for a in removed: self.on_remove(self.bus, a)
+        return bool(added or removed)
+
+    def run(self) -> None:
+        """ watch loop. blocking until stop() """
+        i2c = NosI2CRegistry.acquire(self.bus)
+        try:
+            delay = self.interval
+            while not self._stop.is_set():
+                if self.poll(i2c):
+                    delay = self.interval
+                else:
+                    delay = min(delay * self.backoff, self.max_interval)
+                self._stop.wait(delay)
+        finally:
+            NosI2CRegistry.release(i2c)
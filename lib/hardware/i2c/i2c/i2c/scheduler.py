@@ -0,0 +1,277 @@
+#===================================================================
+# file: scheduler.py
+# desc: per bus worker. owns the bus and runs queued jobs one at a
+#       time, highest priority first, so sequences from different
+#       threads never interleave. plus the priority aware bus lock
+#       that hands the bus to the most urgent waiting thread.
+# dev : nos
+#===================================================================
+import heapq
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+
+class NosI2CScheduler:
+    """
+    Priority job queue with a single worker thread per bus.
+
+    Every job runs to completion while holding the bus lock, so a job
+    is an atomic sequence of bus calls. Jobs of the same priority run
+    in submission order. The job takes the bus lock at its own
+    priority, so it also competes fairly with threads that use the
+    bus directly.
+
+    Attributes:
+        PRIO_HIGH (int): Latency sensitive work, ie servo updates.
+        PRIO_NORMAL (int): Default.
+        PRIO_BULK (int): Background work, ie ADC polling. Runs when nothing else waits.
+        i2c (NosI2C): Bus the jobs run on.
+        waits (Dict[int, List[float]]): [count, total, max] queue wait in seconds per priority.
+    """
+    PRIO_HIGH: int = 0
+    PRIO_NORMAL: int = 1
+    PRIO_BULK: int = 2
+
+    _lock = threading.Lock()
+
+    @classmethod
+    def for_bus(cls, i2c) -> "NosI2CScheduler":
+        """
+        Get the scheduler of a bus, starting it on first use.
+
+        Args:
+            i2c (NosI2C): Bus instance.
+
+        Returns:
+            NosI2CScheduler: The one scheduler attached to this bus.
+        """
+        with cls._lock:
+            sched = getattr(i2c, "scheduler", None)
+            if sched is None or not sched.running:
+                sched = cls(i2c)
+                i2c.scheduler = sched
+            return sched
+
+    def __init__(self, i2c, name: str = None):
+        """
+        Args:
+            i2c (NosI2C): Bus the jobs run on.
+            name (str | None): Worker thread name.
+        """
+        self.i2c = i2c
+        self.waits: Dict[int, List[float]] = {}
+        self.running: bool = True
+        self._queue: "queue.PriorityQueue" = queue.PriorityQueue()
+        self._seq = itertools.count()
+        # submit and stop take it, so no job lands behind the final drain
+        self._stopping = threading.Lock()
+        self._thread = threading.Thread(
+            target=self._run, daemon=True,
+            name=name or "i2c-%s" % getattr(i2c, "bus_id", "?"))
+        self._thread.start()
+
+    def submit(self, fn: Callable, *args, priority: int = PRIO_NORMAL, **kwargs) -> Future:
+        """
+        Queue a job.
+
+        Args:
+            fn (Callable): Called as fn(*args, **kwargs) on the bus thread.
+            priority (int): PRIO_* value. Lower runs first.
+
+        Returns:
+            Future: Resolves to the return value of fn.
+        """
+        fut: Future = Future()
+        with self._stopping:
+            if self.running:
+                self._queue.put((priority, next(self._seq), time.perf_counter(), fut, fn, args, kwargs))
+                return fut
+        fut.set_exception(RuntimeError("scheduler stopped"))
+        return fut
+
+    def call(self, fn: Callable, *args, priority: int = PRIO_NORMAL, **kwargs):
+        """
+        Run a job and wait for its result.
+
+        Notes:
+            - Called from inside a job it runs inline, the bus is already ours.
+        """
+        if threading.current_thread() is self._thread:
+            return fn(*args, **kwargs)
+        return self.submit(fn, *args, priority=priority, **kwargs).result()
+
+    def stop(self, wait: bool = True) -> None:
+        """
+        Stop the worker after the jobs already queued.
+
+        Args:
+            wait (bool): Block until the worker exits.
+        """
+        with self._stopping:
+            if not self.running: return
+            self.running = False
+            # sorts after every real job
+            self._queue.put((float("inf"), next(self._seq), 0, None, None, (), {}))
+        if wait and threading.current_thread() is not self._thread:
+            self._thread.join()
+
+    def stats(self) -> Dict[int, Dict[str, float]]:
+        """
+        Queue wait statistics.
+
+        Returns:
+            Dict[int, Dict[str, float]]: {priority: {"count", "mean", "max"}} in seconds.
+        """
+        return {
+            p: {"count": c, "mean": t / c if c else 0.0, "max": m}
+            for p, (c, t, m) in self.waits.items()
+        }
+
+    def _run(self) -> None:
+        lock = getattr(self.i2c, "lock", None)
+        at = getattr(lock, "at", None)
+        while True:
+            prio, _, queued, fut, fn, args, kwargs = self._queue.get()
+            if fut is None: break
+            if not fut.set_running_or_notify_cancel(): continue
+
+            wait = time.perf_counter() - queued
+            w = self.waits.setdefault(prio, [0, 0.0, 0.0])
+            w[0] += 1
+            w[1] += wait
+            if wait > w[2]: w[2] = wait
+
+            try:
+                if lock is None:
+                    res = fn(*args, **kwargs)
+                elif at is None:
+                    with lock:
+                        res = fn(*args, **kwargs)
+                else:
+                    with at(prio), lock:
+                        res = fn(*args, **kwargs)
+            except BaseException as e:
+                fut.set_exception(e)
+            else:
+                fut.set_result(res)
+
+        # never leave a future pending
+        while not self._queue.empty():
+            fut = self._queue.get_nowait()[3]
+            if fut is not None and fut.set_running_or_notify_cancel():
+                fut.set_exception(RuntimeError("scheduler stopped"))
+
+
+class _AtPriority:
+    """ context setting the calling thread's bus priority. see NosI2CBusLock.at() """
+    __slots__ = ("tls", "priority", "prev")
+
+    def __init__(self, tls: threading.local, priority: int):
+        self.tls = tls
+        self.priority = priority
+
+    def __enter__(self):
+        self.prev = prev = getattr(self.tls, "priority", None)
+        # never drop below what the thread already runs at
+        self.tls.priority = self.priority if prev is None else min(prev, self.priority)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.tls.priority = self.prev
+
+
+class NosI2CBusLock:
+    """
+    Reentrant bus lock that hands the bus to the most urgent waiter.
+
+    A plain RLock wakes an arbitrary waiter, so a servo update can sit
+    behind any amount of bulk traffic from other threads. This lock
+    queues waiters by PRIO_* value, then arrival order, and on release
+    hands the bus straight to the head of the queue. Uncontended it
+    costs about the same as an RLock.
+
+    The priority of an acquire is the calling thread's priority, set with
+    at(). Devices set their own around every bus access (see
+    NosI2CDevice.locked()), scheduler jobs run at the job's priority and
+    everything else is PRIO_NORMAL.
+
+    Example:
+        with bus.lock.at(NosI2CScheduler.PRIO_HIGH), bus.lock:
+            ...
+    """
+
+    def __init__(self):
+        self._mutex = threading.Lock()
+        self._owner: Optional[int] = None
+        self._count: int = 0
+        # heap of [priority, seq, thread ident, event]
+        self._waiters: List[list] = []
+        self._seq = itertools.count()
+        self._tls = threading.local()
+
+    def at(self, priority: int) -> _AtPriority:
+        """
+        Context running the calling thread's bus accesses at a priority.
+
+        Notes:
+            - Nested contexts keep the most urgent priority, so a high
+              priority sequence calling into a bulk device stays high.
+        """
+        return _AtPriority(self._tls, priority)
+
+    def priority(self) -> int:
+        """ the calling thread's current priority """
+        p = getattr(self._tls, "priority", None)
+        return NosI2CScheduler.PRIO_NORMAL if p is None else p
+
+    def owned(self) -> bool:
+        """ True if the calling thread holds the bus """
+        return self._owner == threading.get_ident()
+
+    def waiting(self) -> int:
+        """ threads waiting for the bus """
+        with self._mutex:
+            return len(self._waiters)
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        me = threading.get_ident()
+        with self._mutex:
+            if self._owner == me:
+                self._count += 1
+                return True
+            if self._owner is None:
+                self._owner, self._count = me, 1
+                return True
+            if not blocking: return False
+            w = [self.priority(), next(self._seq), me, threading.Event()]
+            heapq.heappush(self._waiters, w)
+        # release() makes us the owner before it wakes us
+        if w[3].wait(None if timeout < 0 else timeout): return True
+        with self._mutex:
+            if self._owner == me: return True
+            self._waiters.remove(w)
+            heapq.heapify(self._waiters)
+            return False
+
+    def release(self) -> None:
+        with self._mutex:
+            if self._owner != threading.get_ident():
+                raise RuntimeError("cannot release un-acquired lock")
+            self._count -= 1
+            if self._count: return
+            if not self._waiters:
+                self._owner = None
+                return
+            w = heapq.heappop(self._waiters)
+            self._owner, self._count = w[2], 1
+            w[3].set()
+
+    def __enter__(self) -> bool:
+        return self.acquire()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
@@ -0,0 +1,137 @@
+#===================================================================
+# file: shadow.py
+# desc: register shadow for NosI2CDevice. keeps a host side copy of
+#       the device registers so reads of registers only the host
+#       changes never hit the bus, and writes that don't change
+#       anything are dropped.
+# dev : nos
+#===================================================================
+from typing import Iterable, List, Optional, Set, Tuple
+
+
+def coalesce(regs: Iterable[int], gap: int = 0) -> List[Tuple[int, int]]:
+    """
+    Merge register numbers into contiguous ranges.
+
+    Args:
+        regs (Iterable[int]): Register numbers, any order.
+        gap (int): Max number of untouched registers allowed inside a range.
+            Bridging a small gap is often cheaper than a second transaction.
+
+    Returns:
+        List[Tuple[int, int]]: (start, length) per range, sorted by start.
+    """
+    res: List[Tuple[int, int]] = []
+    for r in sorted(set(regs)):
+        if res and r - (res[-1][0] + res[-1][1]) <= gap:
+            start = res[-1][0]
+            res[-1] = (start, r - start + 1)
+        else:
+            res.append((r, 1))
+    return res
+
+
+class NosI2CShadow:
+    """
+    Host side copy of a device register file with dirty tracking.
+
+    Attributes:
+        values (bytearray): Last known value per register.
+        valid (bytearray): 1 if values[reg] is known, 0 otherwise.
+        dirty (Set[int]): Registers staged but not written to the device yet.
+        volatile (Set[int]): Registers the device can change on its own.
+            These are never served from or filtered by the shadow.
+        write_through (bool): Write staged registers immediately if True,
+            otherwise wait for an explicit flush.
+    """
+
+    def __init__(self, size: int = 256, volatile: Iterable[int] = (), write_through: bool = True):
+        """
+        Args:
+            size (int): Number of registers (default 256, full 8-bit pointer).
+            volatile (Iterable[int]): Registers that must always go to the wire.
+            write_through (bool): Write immediately (True) or on flush (False).
+        """
+        self.size: int = size
+        self.values: bytearray = bytearray(size)
+        self.valid: bytearray = bytearray(size)
+        self.dirty: Set[int] = set()
+        self.volatile: Set[int] = set(volatile)
+        self.write_through: bool = write_through
+
+    def is_volatile(self, reg: int, amnt: int = 1) -> bool:
+        """ True if any register in reg..reg+amnt-1 is volatile """
+        return any(r in self.volatile for r in range(reg, reg + amnt))
+
+    def get(self, reg: int, amnt: int = 1) -> Optional[List[int]]:
+        """
+        Cached values for reg..reg+amnt-1.
+
+        Returns:
+            List[int] | None: Values, or None if any register is volatile or unknown.
+        """
+        if reg + amnt > self.size or self.is_volatile(reg, amnt): return None
+        if not all(self.valid[reg:reg + amnt]): return None
+        return list(self.values[reg:reg + amnt])
+
+    def load(self, reg: int, values: List[int]) -> None:
+        """ record values read from the device. pending writes are kept """
+        for i, v in enumerate(values):
+            r = reg + i
+            if r >= self.size or r in self.volatile or r in self.dirty: continue
+            self.values[r] = v & 0xFF
+            self.valid[r] = 1
+
+    def stage(self, reg: int, values: List[int]) -> bool:
+        """
+        Stage a write.
+
+        Returns:
+            bool: True if any register changed and is now dirty.
+
+        Raises:
+            ValueError: The write runs past the end of the shadow.
+        """
+        if reg < 0 or reg + len(values) > self.size:
+            raise ValueError("write of %d bytes at register %#x exceeds shadow size %d" % (len(values), reg, self.size))
+        changed = False
+        for i, v in enumerate(values):
+            r = reg + i
+            v &= 0xFF
+            if self.valid[r] and self.values[r] == v: continue
+            self.values[r] = v
+            self.valid[r] = 1
+            self.dirty.add(r)
+            changed = True
+        return changed
+
+    def take(self, gap: int = 0) -> List[Tuple[int, List[int]]]:
+        """
+        Pop the dirty registers as contiguous blocks.
+
+        Args:
+            gap (int): Clean registers allowed inside a block. Only bridged
+                if their value is known, otherwise the block is split.
+
+        Returns:
+            List[Tuple[int, List[int]]]: (start register, values) per block.
+        """
+        res = []
+        for s, n in coalesce(self.dirty, gap):
+            if all(self.valid[s:s + n]):
+                res.append((s, list(self.values[s:s + n])))
+            else:
+                dirty = [r for r in self.dirty if s <= r < s + n]
+                res.extend((s2, list(self.values[s2:s2 + n2])) for s2, n2 in coalesce(dirty))
+        self.dirty.clear()
+        return res
+
+    def invalidate(self, reg: Optional[int] = None, amnt: int = 1) -> None:
+        """ forget cached values. everything if reg is None """
+        if reg is None:
+            self.valid = bytearray(self.size)
+            self.dirty.clear()
+            return
+        for r in range(reg, min(reg + amnt, self.size)):
+            self.valid[r] = 0
+            self.dirty.discard(r)
@@ -0,0 +1,482 @@
+#===================================================================
+# file: sim.py
+# desc: in-memory i2c bus. drop-in NosI2C backed by register models
+#       instead of /dev/i2c-N, with a clock model that accounts the
+#       wire time every transaction would take on a real bus.
+# dev : nos
+#===================================================================
+import ctypes
+import errno
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import smbus2
+
+from .core import NosI2C
+from .scheduler import NosI2CBusLock
+
+# (addr, read?, data for writes / length for reads)
+Msg = Tuple[int, bool, Union[bytes, int]]
+
+# read length of an SMBus block read. the device sends the count first
+BLOCK_READ = -1
+
+
+class NosI2CClock:
+    """
+    Bus timing model and traffic counters.
+
+    A message costs START + address byte + data bytes, 9 clocks per byte
+    (8 bits + ack), plus ``byte_cost`` per byte for clock stretching. Every
+    ioctl adds ``transaction_cost`` for syscall and driver overhead.
+
+    Attributes:
+        freq (int): SCL frequency in Hz, ie 100_000 or 400_000.
+        transaction_cost (float): Seconds per ioctl on top of the wire time.
+        byte_cost (float): Extra seconds per byte.
+        realtime (bool): Sleep for the modelled time so callers see real latency.
+        ioctls (int): Transactions (ioctls) so far.
+        messages (int): I2C messages (START conditions) so far.
+        bytes (int): Bytes on the wire so far, address bytes included.
+        clocks (int): SCL clocks so far. clocks / freq is the pure wire time at any speed.
+        wire_time (float): Modelled bus time so far in seconds.
+        slept (float): Device side waits so far in seconds, see sleep().
+    """
+
+    def __init__(self, freq: int = 100_000, transaction_cost: float = 0.0, byte_cost: float = 0.0, realtime: bool = False):
+        """
+        Args:
+            freq (int): SCL frequency in Hz.
+            transaction_cost (float): Seconds per ioctl.
+            byte_cost (float): Extra seconds per byte.
+            realtime (bool): Sleep for the modelled time.
+        """
+        self.freq: int = freq
+        self.transaction_cost: float = transaction_cost
+        self.byte_cost: float = byte_cost
+        self.realtime: bool = realtime
+        self.reset()
+
+    def reset(self) -> None:
+        """ zero the counters """
+        self.ioctls: int = 0
+        self.messages: int = 0
+        self.bytes: int = 0
+        self.clocks: int = 0
+        self.wire_time: float = 0.0
+        self.slept: float = 0.0
+
+    def cost(self, lengths: Sequence[int], freq: Optional[int] = None) -> float:
+        """
+        Modelled time of one ioctl.
+
+        Args:
+            lengths (Sequence[int]): Data bytes per message.
+            freq (int | None): Override the SCL frequency.
+        """
+        freq = freq or self.freq
+        nbytes = sum(lengths) + len(lengths)  # + address byte per message
+        return self.clocks_of(lengths) / freq + nbytes * self.byte_cost + self.transaction_cost
+
+    @staticmethod
+    def clocks_of(lengths: Sequence[int]) -> int:
+        """ SCL clocks of one ioctl with the given data bytes per message """
+        nbytes = sum(lengths) + len(lengths)
+        # 9 clocks per byte, ~1 clock each for START/repeated START and the STOP
+        return nbytes * 9 + len(lengths) + 1
+
+    def account(self, lengths: Sequence[int]) -> float:
+        """ count one ioctl. returns its modelled time """
+        t = self.cost(lengths)
+        self.ioctls += 1
+        self.messages += len(lengths)
+        self.bytes += sum(lengths) + len(lengths)
+        self.clocks += self.clocks_of(lengths)
+        self.wire_time += t
+        if self.realtime: time.sleep(t)
+        return t
+
+    def sleep(self, t: float) -> None:
+        """ wait for a modelled device, ie chip startup. only sleeps in realtime mode """
+        self.slept += t
+        if self.realtime: time.sleep(t)
+
+    def snapshot(self) -> Dict[str, float]:
+        """ counters as a dict """
+        return {
+            "ioctls": self.ioctls, "messages": self.messages, "bytes": self.bytes,
+            "clocks": self.clocks, "wire_time": self.wire_time,
+        }
+
+
+#===================================================================
+# device models
+#===================================================================
+class SimDevice:
+    """
+    Base device model. Acks its address, ignores writes, reads 0xFF.
+
+    Attributes:
+        addr (int): 7-bit address.
+    """
+
+    def __init__(self, addr: int):
+        self.addr: int = addr
+
+    def write(self, data: bytes) -> None:
+        """ one write message addressed to this device """
+
+    def read(self, n: int) -> bytes:
+        """ one read message addressed to this device """
+        return b"\xff" * n
+
+
+class SimRegisterDevice(SimDevice):
+    """
+    Generic register file device. First byte of a write sets the pointer.
+
+    Attributes:
+        regs (bytearray): Register file.
+        pointer (int): Register pointer.
+    """
+
+    def __init__(self, addr: int, size: int = 256, auto_increment: bool = True):
+        super().__init__(addr)
+        self.regs: bytearray = bytearray(size)
+        self.pointer: int = 0
+        self._auto_increment = auto_increment
+
+    @property
+    def auto_increment(self) -> bool:
+        return self._auto_increment
+
+    def set_reg(self, reg: int, value: int) -> None:
+        self.regs[reg] = value & 0xFF
+
+    def get_reg(self, reg: int) -> int:
+        return self.regs[reg]
+
+    def _advance(self) -> None:
+        if self.auto_increment: self.pointer = (self.pointer + 1) % len(self.regs)
+
+    def write(self, data: bytes) -> None:
+        if not data: return
+        self.pointer = data[0] % len(self.regs)
+        for v in data[1:]:
+            self.set_reg(self.pointer, v)
+            self._advance()
+
+    def read(self, n: int) -> bytes:
+        res = bytearray()
+        for _ in range(n):
+            res.append(self.get_reg(self.pointer))
+            self._advance()
+        return bytes(res)
+
+
+class SimPCF8574(SimDevice):
+    """
+    PCF8574 quasi-bidirectional port.
+
+    Attributes:
+        latch (int): Output latch. Power on 0xFF.
+        external (int): Levels driven onto the pins from outside. 1 = not pulled low.
+        int_asserted (bool): INT line state. Set on input change, cleared by a read.
+        on_int (List[Callable]): Called with the model when INT asserts.
+        writes (int): Port bytes written so far.
+    """
+
+    def __init__(self, addr: int = 0x20):
+        super().__init__(addr)
+        self.latch: int = 0xFF
+        self.external: int = 0xFF
+        self.int_asserted: bool = False
+        self.on_int: List[Callable[["SimPCF8574"], None]] = []
+        self.writes: int = 0
+
+    @property
+    def port(self) -> int:
+        """ pin levels. a pin is high only if latched high and not pulled low """
+        return self.latch & self.external
+
+    def drive(self, value: int) -> None:
+        """ drive the pins from outside, ie a button pulling a pin low """
+        before = self.port
+        self.external = value & 0xFF
+        if self.port != before: self._assert_int()
+
+    def _assert_int(self) -> None:
+        self.int_asserted = True
+        for cb in self.on_int: cb(self)
+
+    def write(self, data: bytes) -> None:
+        # every byte is latched in turn
+        for v in data:
+            self.latch = v
+            self.writes += 1
+
+    def read(self, n: int) -> bytes:
+        self.int_asserted = False
+        return bytes([self.port]) * n
+
+
+class SimIntLine:
+    """
+    INT output of a SimPCF8574 seen as a GPIO input, same shape as
+    pigpiod's HWGPIO. Open drain, active low: state is False while asserted.
+    """
+
+    def __init__(self, model: SimPCF8574):
+        self.model = model
+        self.callbacks: List[Callable[["SimIntLine"], None]] = []
+        model.on_int.append(lambda m: [cb(self) for cb in list(self.callbacks)])
+
+    @property
+    def state(self) -> bool:
+        return not self.model.int_asserted
+
+    def add_listener(self, callback: Callable[["SimIntLine"], None]) -> None:
+        if callback not in self.callbacks: self.callbacks.append(callback)
+
+
+class SimPCF8591(SimDevice):
+    """
+    PCF8591 ADC/DAC.
+
+    Reads return the conversion started by the previous read byte, so the
+    first byte after a channel switch is stale, as on the real chip.
+
+    Attributes:
+        vref (float): Reference voltage.
+        inputs (List[float | Callable[[], float]]): Voltage per AIN pin, or a callable.
+        ctrl (int): Control byte.
+        channel (int): Channel the next conversion samples.
+        dac (int): DAC value.
+        dac_writes (int): DAC bytes written so far.
+    """
+
+    def __init__(self, addr: int = 0x48, vref: float = 5.0):
+        super().__init__(addr)
+        self.vref: float = vref
+        self.inputs: List[Union[float, Callable[[], float]]] = [0.0] * 4
+        self.ctrl: int = 0
+        self.channel: int = 0
+        self.dac: int = 0
+        self.dac_writes: int = 0
+        self._last: int = 0x80
+
+    def convert(self, ch: int) -> int:
+        v = self.inputs[ch]
+        if callable(v): v = v()
+        return max(0, min(255, int(round(v * 255 / self.vref))))
+
+    def write(self, data: bytes) -> None:
+        if not data: return
+        self.ctrl = data[0]
+        self.channel = self.ctrl & 0x03
+        for v in data[1:]:
+            self.dac = v
+            self.dac_writes += 1
+
+    def read(self, n: int) -> bytes:
+        res = bytearray()
+        for _ in range(n):
+            res.append(self._last)
+            self._last = self.convert(self.channel)
+            if self.ctrl & 0x04: self.channel = (self.channel + 1) & 0x03
+        return bytes(res)
+
+
+class SimPCA9685(SimRegisterDevice):
+    """
+    PCA9685 PWM controller.
+
+    Attributes:
+        MODE1_RESTART, MODE1_AI, MODE1_SLEEP (int): MODE1 bits.
+    """
+    MODE1_RESTART = 0x80
+    MODE1_AI = 0x20
+    MODE1_SLEEP = 0x10
+    REG_MODE1 = 0x00
+    REG_ALL_LED = 0xFA
+    REG_PRESCALE = 0xFE
+
+    def __init__(self, addr: int = 0x40):
+        super().__init__(addr)
+        self.regs[self.REG_MODE1] = 0x11   # SLEEP | ALLCALL
+        self.regs[0x01] = 0x04             # MODE2 OUTDRV
+        self.regs[self.REG_PRESCALE] = 0x1E
+        for ch in range(16):
+            self.regs[0x09 + ch * 4] = 0x10  # FULL_OFF
+
+    @property
+    def auto_increment(self) -> bool:
+        return bool(self.regs[self.REG_MODE1] & self.MODE1_AI)
+
+    def set_reg(self, reg: int, value: int) -> None:
+        value &= 0xFF
+        if reg == self.REG_MODE1:
+            # RESTART self clears once written
+            value &= ~self.MODE1_RESTART
+        elif reg == self.REG_PRESCALE and not self.regs[self.REG_MODE1] & self.MODE1_SLEEP:
+            # prescale is only writable while asleep
+            return
+        elif self.REG_ALL_LED <= reg < self.REG_ALL_LED + 4:
+            for ch in range(16):
+                self.regs[0x06 + ch * 4 + reg - self.REG_ALL_LED] = value
+            return
+        self.regs[reg] = value
+
+    def get_reg(self, reg: int) -> int:
+        if self.REG_ALL_LED <= reg < self.REG_ALL_LED + 4: return 0
+        return self.regs[reg]
+
+
+#===================================================================
+# bus
+#===================================================================
+class NosI2CSim(NosI2C):
+    """
+    NosI2C backed by device models instead of /dev/i2c-N.
+
+    Every SMBus call and i2c_rdwr is turned into I2C messages, routed to
+    the model at the address, and accounted on the clock. Addresses with
+    no model nack with EREMOTEIO like a real bus.
+
+    Attributes:
+        devices (Dict[int, SimDevice]): Models by address.
+        clock (NosI2CClock): Timing model and counters.
+    """
+    _mock_lock = threading.Lock()
+    _mocks: Dict[int, "NosI2CSim"] = {}
+
+    @classmethod
+    def mock(cls, bus: int = 1) -> "NosI2CSim":
+        """ process wide simulated bus per bus number. used by driver MOCK modes """
+        with cls._mock_lock:
+            sim = cls._mocks.get(bus)
+            if sim is None: sim = cls._mocks[bus] = cls(bus)
+            return sim
+
+    def __init__(self, bus: int = 1, devices: Sequence[SimDevice] = (), clock: Optional[NosI2CClock] = None):
+        """
+        Args:
+            bus (int): Bus number reported as bus_id. Nothing is opened.
+            devices (Sequence[SimDevice]): Models to attach.
+            clock (NosI2CClock | None): Timing model. Defaults to 100 kHz.
+        """
+        self.lock = NosI2CBusLock()
+        smbus2.SMBus.__init__(self, None)
+        self.bus_id = bus
+        self.devices: Dict[int, SimDevice] = {}
+        self.clock: NosI2CClock = clock or NosI2CClock()
+        for d in devices: self.attach(d)
+
+    def attach(self, device: SimDevice) -> SimDevice:
+        """ put a model on the bus. returns it """
+        self.devices[device.addr] = device
+        return device
+
+    def detach(self, addr: int) -> None:
+        """ take the model at addr off the bus """
+        self.devices.pop(addr, None)
+
+    @property
+    def freq(self) -> int:
+        """ SCL frequency of the clock model """
+        return self.clock.freq
+
+    def sleep(self, t: float) -> None:
+        """ device side wait, on the clock model """
+        self.clock.sleep(t)
+
+    def close(self):
+        sched = getattr(self, "scheduler", None)
+        if sched is not None: sched.stop()
+        poller = getattr(self, "poller", None)
+        if poller is not None: poller.stop()
+
+    def _xfer(self, msgs: List[Msg]) -> List[bytes]:
+        """ run one ioctl worth of messages. returns the data of every read, a BLOCK_READ with its count byte """
+        with self.lock:
+            lengths = [(1 if m[2] == BLOCK_READ else m[2]) if m[1] else len(m[2]) for m in msgs]
+            res = []
+            try:
+                for i, (addr, rd, data) in enumerate(msgs):
+                    dev = self.devices.get(addr)
+                    if dev is None: raise OSError(errno.EREMOTEIO, "Remote I/O error")
+                    if not rd:
+                        dev.write(bytes(data))
+                    elif data != BLOCK_READ:
+                        res.append(dev.read(data))
+                    else:
+                        # the adapter stops after a bad count, like the kernel
+                        count = dev.read(1)[0]
+                        if not 0 < count <= 32: raise OSError(errno.EPROTO, "Protocol error")
+                        res.append(bytes([count]) + dev.read(count))
+                        lengths[i] = count + 1
+            finally:
+                self.clock.account(lengths)
+            return res
+
+    # -----------------------------
+    # smbus
+    # -----------------------------
+    def write_quick(self, i2c_addr, force=None):
+        self._xfer([(i2c_addr, False, b"")])
+
+    def read_byte(self, i2c_addr, force=None):
+        return self._xfer([(i2c_addr, True, 1)])[0][0]
+
+    def write_byte(self, i2c_addr, value, force=None):
+        self._xfer([(i2c_addr, False, bytes([value & 0xFF]))])
+
+    def read_byte_data(self, i2c_addr, register, force=None):
+        return self._xfer([(i2c_addr, False, bytes([register])), (i2c_addr, True, 1)])[0][0]
+
+    def write_byte_data(self, i2c_addr, register, value, force=None):
+        self._xfer([(i2c_addr, False, bytes([register, value & 0xFF]))])
+
+    def read_word_data(self, i2c_addr, register, force=None):
+        d = self._xfer([(i2c_addr, False, bytes([register])), (i2c_addr, True, 2)])[0]
+        return d[0] | d[1] << 8
+
+    def write_word_data(self, i2c_addr, register, value, force=None):
+        self._xfer([(i2c_addr, False, bytes([register, value & 0xFF, (value >> 8) & 0xFF]))])
+
+    def read_i2c_block_data(self, i2c_addr, register, length, force=None):
+        assert length <= 32, "smbus block limit is 32 bytes"
+        return list(self._xfer([(i2c_addr, False, bytes([register])), (i2c_addr, True, length)])[0])
+
+    def write_i2c_block_data(self, i2c_addr, register, data, force=None):
+        assert len(data) <= 32, "smbus block limit is 32 bytes"
+        self._xfer([(i2c_addr, False, bytes([register]) + bytes(v & 0xFF for v in data))])
+
+    def process_call(self, i2c_addr, register, value, force=None):
+        d = self._xfer([(i2c_addr, False, bytes([register, value & 0xFF, (value >> 8) & 0xFF])), (i2c_addr, True, 2)])[0]
+        return d[0] | d[1] << 8
+
+    def read_block_data(self, i2c_addr, register, force=None):
+        return list(self._xfer([(i2c_addr, False, bytes([register])), (i2c_addr, True, BLOCK_READ)])[0][1:])
+
+    def write_block_data(self, i2c_addr, register, data, force=None):
+        assert len(data) <= 32, "smbus block limit is 32 bytes"
+        self._xfer([(i2c_addr, False, bytes([register, len(data)]) + bytes(v & 0xFF for v in data))])
+
+    def block_process_call(self, i2c_addr, register, data, force=None):
+        assert len(data) <= 32, "smbus block limit is 32 bytes"
+        msgs = [(i2c_addr, False, bytes([register, len(data)]) + bytes(v & 0xFF for v in data)),
+                (i2c_addr, True, BLOCK_READ)]
+        return list(self._xfer(msgs)[0][1:])
+
+    def i2c_rdwr(self, *i2c_msgs):
+        msgs: List[Msg] = []
+        for m in i2c_msgs:
+            rd = bool(m.flags & smbus2.smbus2.I2C_M_RD)
+            msgs.append((m.addr, rd, m.len if rd else bytes(m)))
+        data = iter(self._xfer(msgs))
+        for m in i2c_msgs:
+            if m.flags & smbus2.smbus2.I2C_M_RD:
+                d = next(data)
+                ctypes.memmove(m.buf, d, len(d))
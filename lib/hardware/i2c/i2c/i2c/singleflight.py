@@ -0,0 +1,129 @@
+#===================================================================
+# file: singleflight.py
+# desc: coalesce identical concurrent reads. callers arriving while
+#       a read is in flight wait for it and share its result instead
+#       of queueing their own transaction. writes bump a generation
+#       per address so no read from before a write is reused after it.
+# dev : nos
+#===================================================================
+import copy
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _Flight:
+    __slots__ = ("event", "value", "error", "gen")
+
+    def __init__(self, gen: tuple):
+        self.event = threading.Event()
+        self.gen: tuple = gen
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class NosI2CSingleFlight:
+    """
+    Single-flight table, one per bus.
+
+    Attributes:
+        hits (int): Calls answered by an in-flight read.
+        cached (int): Calls answered from the staleness window.
+        misses (int): Calls that went to the bus.
+    """
+    _lock = threading.Lock()
+
+    @classmethod
+    def for_bus(cls, i2c) -> "NosI2CSingleFlight":
+        """ the table attached to a bus, created on first use """
+        with cls._lock:
+            sf = getattr(i2c, "singleflight", None)
+            if sf is None:
+                sf = i2c.singleflight = cls()
+            return sf
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._results: Dict[Hashable, Tuple[float, Any]] = {}
+        # write generation, all addresses and per address
+        self._epoch: int = 0
+        self._gens: Dict[int, int] = {}
+        self.hits: int = 0
+        self.cached: int = 0
+        self.misses: int = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any], max_staleness: float = 0.0) -> Any:
+        """
+        Run fn once for all concurrent callers with the same key.
+
+        Args:
+            key (Hashable): Identifies the read, ie (addr, "reg", reg, amnt).
+            fn (Callable): Performs the read.
+            max_staleness (float): Also accept a result finished at most this
+                many seconds ago. 0 only shares in-flight reads.
+
+        Returns:
+            Any: Result of fn. Lists are copied per caller.
+
+        Notes:
+            - A read in flight when its address is written is neither
+              joined by later callers nor kept as a result.
+        """
+        with self._lock:
+            gen = self._gen(key[0])
+            if max_staleness > 0:
+                res = self._results.get(key)
+                if res is not None and time.monotonic() - res[0] <= max_staleness:
+                    self.cached += 1
+                    return copy.copy(res[1])
+            flight = self._flights.get(key)
+            # started before a write. may have read the old state
+            leader = flight is None or flight.gen != gen
+            if leader:
+                flight = self._flights[key] = _Flight(gen)
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None: raise flight.error
+            return copy.copy(flight.value)
+
+        try:
+            flight.value = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight: del self._flights[key]
+                if flight.error is None and self._gen(key[0]) == flight.gen:
+                    self._results[key] = (time.monotonic(), flight.value)
+            flight.event.set()
+        return copy.copy(flight.value)
+
+    def _gen(self, addr) -> tuple:
+        return (self._epoch, self._gens.get(addr, 0))
+
+    def forget(self, addr: Optional[int] = None) -> None:
+        """
+        Device state changed. Drop finished results so the next read goes
+        to the bus, and retire the reads in flight.
+
+        Args:
+            addr (int | None): Only keys starting with this address. None drops all.
+
+        Notes:
+            - Call after the write is on the wire. A read that got the bus
+              before the write then can't be reused after it.
+        """
+        with self._lock:
+            if addr is None:
+                self._epoch += 1
+                self._results.clear()
+            else:
+                self._gens[addr] = self._gens.get(addr, 0) + 1
+                for k in [k for k in self._results if k[0] == addr]:
+                    del self._results[k]
@@ -0,0 +1,218 @@
+#===================================================================
+# file: trace.py
+# desc: opt-in transaction tracing for NosI2C. ring buffer of the
+#       last transactions, per address latency histograms and error
+#       counters. nothing is wrapped while tracing is off.
+# dev : nos
+#===================================================================
+import csv
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from itertools import groupby
+from typing import Callable, Deque, Dict, List, NamedTuple, Optional
+
+
+class NosI2CRecord(NamedTuple):
+    """ one traced transaction """
+    t: float                # perf_counter at start
+    op: str                 # smbus method name
+    addr: int
+    reg: Optional[int]      # None for calls without a register pointer
+    direction: str          # "r", "w" or "rw"
+    length: int             # data bytes, register pointer excluded
+    duration: float         # seconds
+    errno: int              # 0 on success
+
+
+# method -> (direction, has register, data length from (args, result))
+TRACED: Dict[str, tuple] = {
+    "write_quick":          ("w",  False, lambda a, r: 0),
+    "read_byte":            ("r",  False, lambda a, r: 1),
+    "write_byte":           ("w",  False, lambda a, r: 1),
+    "read_byte_data":       ("r",  True,  lambda a, r: 1),
+    "write_byte_data":      ("w",  True,  lambda a, r: 1),
+    "read_word_data":       ("r",  True,  lambda a, r: 2),
+    "write_word_data":      ("w",  True,  lambda a, r: 2),
+    "process_call":         ("rw", True,  lambda a, r: 4),
+    "read_block_data":      ("r",  True,  lambda a, r: len(r) if r else 0),
+    "write_block_data":     ("w",  True,  lambda a, r: len(a[2])),
+    "block_process_call":   ("rw", True,  lambda a, r: len(a[2]) + (len(r) if r else 0)),
+    "read_i2c_block_data":  ("r",  True,  lambda a, r: a[2]),
+    "write_i2c_block_data": ("w",  True,  lambda a, r: len(a[2])),
+}
+
+
+class NosI2CTracer:
+    """
+    Collects traced transactions.
+
+    Attributes:
+        BUCKETS (int): Histogram buckets. Bucket i counts durations below 2**i us,
+            the last bucket takes everything slower.
+        records (Deque[NosI2CRecord]): Last ``size`` transactions.
+        hist (Dict[int, List[int]]): Latency histogram per address.
+        errors (Dict[int, Dict[int, int]]): {addr: {errno: count}}.
+        counts (Dict[int, int]): Transactions per address.
+        busy (Dict[int, float]): Total seconds spent per address.
+        worst (Dict[int, float]): Slowest transaction per address in seconds.
+    """
+    BUCKETS: int = 20
+
+    def __init__(self, size: int = 1024):
+        """
+        Args:
+            size (int): Ring buffer length.
+        """
+        self.records: Deque[NosI2CRecord] = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """ drop everything recorded so far """
+        with self._lock:
+            self.records.clear()
+            self.hist: Dict[int, List[int]] = {}
+            self.errors: Dict[int, Dict[int, int]] = {}
+            self.counts: Dict[int, int] = {}
+            self.busy: Dict[int, float] = {}
+            self.worst: Dict[int, float] = {}
+
+    def record(self, rec: NosI2CRecord) -> None:
+        """ add one transaction """
+        b = min(int(rec.duration * 1e6).bit_length(), self.BUCKETS - 1)
+        with self._lock:
+            self.records.append(rec)
+            h = self.hist.get(rec.addr)
+            if h is None: h = self.hist[rec.addr] = [0] * self.BUCKETS
+            h[b] += 1
+            self.counts[rec.addr] = self.counts.get(rec.addr, 0) + 1
+            self.busy[rec.addr] = self.busy.get(rec.addr, 0.0) + rec.duration
+            if rec.duration > self.worst.get(rec.addr, 0.0): self.worst[rec.addr] = rec.duration
+            if rec.errno:
+                e = self.errors.setdefault(rec.addr, {})
+                e[rec.errno] = e.get(rec.errno, 0) + 1
+
+    # -----------------------------
+    # wrapping
+    # -----------------------------
+    def wrap(self, fn: Callable, op: str, lock=None) -> Callable:
+        """
+        Traced version of a bound smbus method.
+
+        Args:
+            fn (Callable): Method to wrap.
+            op (str): Name in TRACED.
+            lock (RLock | None): Bus lock. Taken before the clock starts, so
+                time spent waiting for other threads is not bus time.
+        """
+        direction, has_reg, length = TRACED[op]
+        record, clock = self.record, time.perf_counter
+        lock = lock or nullcontext()
+
+        def traced(*args, **kwargs):
+            with lock:
+                t = clock()
+                try:
+                    res = fn(*args, **kwargs)
+                except OSError as e:
+                    record(NosI2CRecord(t, op, args[0], args[1] if has_reg else None, direction, 0, clock() - t, e.errno or -1))
+                    raise
+                record(NosI2CRecord(t, op, args[0], args[1] if has_reg else None, direction, length(args, res), clock() - t, 0))
+                return res
+        return traced
+
+    def wrap_rdwr(self, fn: Callable, lock=None) -> Callable:
+        """
+        Traced version of a bound i2c_rdwr.
+
+        Notes:
+            - One ioctl can address several devices. Consecutive messages to
+              the same address make one record each, the ioctl's time is
+              split between them by bytes on the wire (address byte included).
+        """
+        record, clock = self.record, time.perf_counter
+        lock = lock or nullcontext()
+
+        def traced(*msgs):
+            with lock:
+                t = clock()
+                err = 0
+                try:
+                    return fn(*msgs)
+                except OSError as e:
+                    err = e.errno or -1
+                    raise
+                finally:
+                    duration = clock() - t
+                    segs = [list(g) for _, g in groupby(msgs, key=lambda m: m.addr)]
+                    wire = sum(m.len + 1 for m in msgs) or 1
+                    for seg in segs:
+                        share = duration * sum(m.len + 1 for m in seg) / wire
+                        record(self._rdwr_record(t, seg, share, err))
+                        t += share
+        return traced
+
+    @staticmethod
+    def _rdwr_record(t: float, msgs: List, duration: float, err: int) -> NosI2CRecord:
+        """ one record for consecutive i2c_rdwr messages to one address """
+        reads = [m for m in msgs if m.flags & 1]
+        writes = [m for m in msgs if not m.flags & 1]
+        direction = "rw" if reads and writes else ("r" if reads else "w")
+        # a leading write followed by reads is a register pointer
+        reg = None
+        if reads and writes and not msgs[0].flags & 1 and msgs[0].len:
+            reg = bytes(msgs[0])[0]
+        length = sum(m.len for m in msgs) - (1 if reg is not None else 0)
+        return NosI2CRecord(t, "i2c_rdwr", msgs[0].addr, reg, direction, length, duration, err)
+
+    # -----------------------------
+    # reporting
+    # -----------------------------
+    def percentile(self, addr: int, p: float) -> float:
+        """ upper bound in seconds of the histogram bucket holding the p-th percentile """
+        h = self.hist.get(addr)
+        if not h: return 0.0
+        target = sum(h) * p / 100
+        acc = 0
+        for i, n in enumerate(h):
+            acc += n
+            if acc >= target: return (1 << i) / 1e6
+        return (1 << (self.BUCKETS - 1)) / 1e6
+
+    def export(self) -> Dict:
+        """ everything as plain python types, ready for json """
+        with self._lock:
+            return {
+                "records": [r._asdict() for r in self.records],
+                "addresses": {
+                    hex(a): {
+                        "count": self.counts[a],
+                        "busy": self.busy[a],
+                        "worst": self.worst.get(a, 0.0),
+                        "hist_us_pow2": list(self.hist[a]),
+                        "errors": dict(self.errors.get(a, {})),
+                    }
+                    for a in self.counts
+                },
+            }
+
+    def export_csv(self, path: str) -> None:
+        """ write the ring buffer to a csv file """
+        with self._lock:
+            recs = list(self.records)
+        with open(path, "w", newline="") as f:
+            w = csv.writer(f)
+            w.writerow(NosI2CRecord._fields)
+            w.writerows(recs)
+
+    def dump(self) -> None:
+        """ print a per address summary """
+        print("%-6s %8s %10s %8s %8s %8s  %s" % ("addr", "count", "busy ms", "p50 us", "p99 us", "max us", "errors"))
+        for a in sorted(self.counts):
+            print("%-6s %8d %10.2f %8d %8d %8d  %s" % (
+                hex(a), self.counts[a], self.busy[a] * 1e3,
+                self.percentile(a, 50) * 1e6, self.percentile(a, 99) * 1e6,
+                self.worst.get(a, 0.0) * 1e6, self.errors.get(a, {}) or "",
+            ))
@@ -0,0 +1,208 @@
+#===================================================================
+# file: transaction.py
+# desc: combined i2c transactions. queue reads and writes and
+#       submit them as one i2c_rdwr ioctl instead of one ioctl per
+#       smbus call.
+# dev : nos
+# os :
+#   * linux
+#===================================================================
+from contextlib import nullcontext
+from typing import List, Optional, Union
+from smbus2 import i2c_msg
+
+Data = Union[bytes, bytearray, List[int]]
+
+
+class NosI2CTransaction:
+    """
+    Builder for combined I2C transactions.
+
+    Writes and reads are queued and sent with ``i2c_rdwr``. Every queued
+    operation becomes one or more messages; all messages go out in as few
+    ioctls as the kernel allows, with a repeated start between them.
+
+    Attributes:
+        MAX_MSGS (int): Max messages per ioctl (I2C_RDWR_IOCTL_MAX_MSGS).
+        MAX_LEN (int): Max bytes per message accepted by the kernel.
+    """
+    MAX_MSGS: int = 42
+    MAX_LEN: int = 8192
+
+    class NO_ADDR_PROVIDED(Exception):pass
+
+    def __init__(self, i2c, addr: Optional[int] = None, chunk: Optional[int] = None, priority: Optional[int] = None):
+        """
+        Create an empty transaction.
+
+        Args:
+            i2c (NosI2C): Bus the transaction is submitted on.
+            addr (int | None): Default device address for queued operations.
+            chunk (int | None): Max payload bytes per message. Defaults to MAX_LEN.
+                Some adapters only accept short messages; lower this for them.
+            priority (int | None): PRIO_* the bus lock is taken at on submit.
+                None keeps the calling thread's priority.
+        """
+        self.i2c = i2c
+        self.addr: Optional[int] = addr
+        self.chunk: int = min(chunk or self.MAX_LEN, self.MAX_LEN)
+        self.priority: Optional[int] = priority
+        assert self.chunk > 0, "chunk must be > 0"
+
+        # groups of messages that must stay in the same ioctl
+        self._groups: List[List[i2c_msg]] = []
+        # read messages per queued read, in queue order
+        self._reads: List[List[i2c_msg]] = []
+
+    def __len__(self) -> int:
+        """ number of queued messages """
+        return sum(len(g) for g in self._groups)
+
+    def __enter__(self) -> "NosI2CTransaction":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # only hit the bus if the block finished cleanly
+        if exc_type is None:
+            self.submit()
+
+    def _addr(self, addr: Optional[int]) -> int:
+        if addr is None: addr = self.addr
+        if addr is None: raise NosI2CTransaction.NO_ADDR_PROVIDED
+        return addr
+
+    # -----------------------------
+    # queueing
+    # -----------------------------
+    def write(self, data: Data, addr: Optional[int] = None) -> "NosI2CTransaction":
+        """
+        Queue a plain write. No register pointer.
+
+        Args:
+            data (bytes | List[int]): Bytes to write.
+            addr (int | None): Device address, defaults to the transaction address.
+
+        Notes:
+            - Data longer than ``chunk`` is split into several messages.
+              Devices that latch every byte (ie PCF8574) don't care about the split.
+        """
+        addr = self._addr(addr)
+        data = bytes(v & 0xFF for v in data)
+        for i in range(0, len(data), self.chunk):
+            self._groups.append([i2c_msg.write(addr, data[i:i + self.chunk])])
+        return self
+
+    def write_reg(self, reg: int, data: Data, addr: Optional[int] = None) -> "NosI2CTransaction":
+        """
+        Queue a register write. Register pointer followed by data.
+
+        Args:
+            reg (int): First register.
+            data (bytes | List[int]): Bytes written starting at ``reg``.
+            addr (int | None): Device address, defaults to the transaction address.
+
+        Notes:
+            - Relies on the device auto-incrementing its register pointer.
+            - Chunks are re-addressed to ``reg + offset`` so each one is a complete write.
+        """
+        addr = self._addr(addr)
+        data = bytes(v & 0xFF for v in data)
+        step = self.chunk - 1
+        assert step > 0, "chunk too small for a register write"
+        for i in range(0, max(len(data), 1), step):
+            buf = bytes([(reg + i) & 0xFF]) + data[i:i + step]
+            self._groups.append([i2c_msg.write(addr, buf)])
+        return self
+
+    def read(self, n: int, addr: Optional[int] = None) -> "NosI2CTransaction":
+        """
+        Queue a plain read. No register pointer.
+
+        Args:
+            n (int): Number of bytes to read.
+            addr (int | None): Device address, defaults to the transaction address.
+        """
+        addr = self._addr(addr)
+        assert n > 0, "n must be > 0"
+        msgs = []
+        for i in range(0, n, self.chunk):
+            m = i2c_msg.read(addr, min(self.chunk, n - i))
+            self._groups.append([m])
+            msgs.append(m)
+        self._reads.append(msgs)
+        return self
+
+    def read_reg(self, reg: int, n: int, addr: Optional[int] = None) -> "NosI2CTransaction":
+        """
+        Queue a register read. Writes the register pointer then reads
+        with a repeated start in between.
+
+        Args:
+            reg (int): First register.
+            n (int): Number of bytes to read.
+            addr (int | None): Device address, defaults to the transaction address.
+
+        Notes:
+            - Relies on the device auto-incrementing its register pointer.
+        """
+        addr = self._addr(addr)
+        assert n > 0, "n must be > 0"
+        msgs = []
+        for i in range(0, n, self.chunk):
+            m = i2c_msg.read(addr, min(self.chunk, n - i))
+            # pointer write and read have to share an ioctl for the repeated start
+            self._groups.append([i2c_msg.write(addr, [(reg + i) & 0xFF]), m])
+            msgs.append(m)
+        self._reads.append(msgs)
+        return self
+
+    def extend(self, other: "NosI2CTransaction") -> "NosI2CTransaction":
+        """
+        Queue everything queued on another transaction of the same bus.
+
+        Lets devices prepare their own part (ie dev.transaction()) and
+        still send all parts as one combined transaction. Reads of
+        ``other`` come back after the reads already queued here.
+        """
+        self._groups.extend(other._groups)
+        self._reads.extend(other._reads)
+        return self
+
+    # -----------------------------
+    # submit
+    # -----------------------------
+    def batches(self) -> List[List[i2c_msg]]:
+        """
+        Split the queued messages into ioctl sized batches.
+
+        Returns:
+            List[List[i2c_msg]]: Messages per ioctl. Groups are never split.
+        """
+        res: List[List[i2c_msg]] = []
+        cur: List[i2c_msg] = []
+        for g in self._groups:
+            if cur and len(cur) + len(g) > self.MAX_MSGS:
+                res.append(cur)
+                cur = []
+            cur.extend(g)
+        if cur: res.append(cur)
+        return res
+
+    def submit(self) -> List[List[int]]:
+        """
+        Send every queued message and clear the queue.
+
+        Returns:
+            List[List[int]]: Bytes of each queued read, in queue order.
+        """
+        reads = self._reads
+        batches = self.batches()
+        lock = getattr(self.i2c, "lock", None)
+        at = getattr(lock, "at", None)
+        prio = nullcontext() if at is None or self.priority is None else at(self.priority)
+        # more than one ioctl. keep other threads off the bus in between
+        with prio, lock or nullcontext():
+            for batch in batches:
+                self.i2c.i2c_rdwr(*batch)
+        self._groups, self._reads = [], []
+        return [[b for m in msgs for b in bytes(m)] for msgs in reads]
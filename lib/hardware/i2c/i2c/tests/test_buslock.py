@@ -0,0 +1,120 @@
+#===================================================================
+# file: test_buslock.py
+# desc: the bus lock hands the bus to the most urgent waiter, for
+#       direct driver calls and scheduler jobs alike.
+# dev : nos
+#===================================================================
+import threading
+import time
+
+from i2c import NosI2CScheduler
+from i2c.scheduler import NosI2CBusLock
+from i2c.sim import NosI2CSim, SimPCA9685, SimPCF8591
+from pca9685 import PCA9685
+from pcf8591 import PCF8591
+
+
+def _bus():
+    """ simulated bus with a bulk ADC and a high priority servo board. records the address of every ioctl """
+    bus = NosI2CSim(devices=[SimPCF8591(0x48), SimPCA9685(0x40)])
+    adc, pwm = PCF8591(0x48, i2c=bus), PCA9685(0x40, i2c=bus)
+    order = []
+    xfer = bus._xfer
+    def traced(msgs):
+        order.append(msgs[0][0])
+        return xfer(msgs)
+    bus._xfer = traced
+    return bus, adc, pwm, order
+
+
+def _until(cond, timeout=2.0):
+    end = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < end, "timed out"
+        time.sleep(0.001)
+
+
+def _spawn(fn, *args):
+    t = threading.Thread(target=fn, args=args, daemon=True)
+    t.start()
+    return t
+
+
+def test_high_priority_call_overtakes_bulk_waiters():
+    bus, adc, pwm, order = _bus()
+    with bus.lock:
+        threads = [_spawn(adc.get_analog, 0) for _ in range(4)]
+        _until(lambda: bus.lock.waiting() == 4)
+        threads.append(_spawn(pwm.set_duty_cycle, 0, 50))
+        _until(lambda: bus.lock.waiting() == 5)
+    for t in threads: t.join(2)
+    assert order[0] == 0x40
+    assert order[1:] == [0x48] * 4
+
+
+def test_scheduler_job_waits_at_its_priority():
+    bus, adc, pwm, order = _bus()
+    with bus.lock:
+        bulk = adc.submit(adc.get_all)
+        _until(lambda: bus.lock.waiting() == 1)
+        direct = _spawn(adc.get_analog, 1)
+        _until(lambda: bus.lock.waiting() == 2)
+        high = pwm.submit(pwm.set_duty_cycle, 1, 25, priority=NosI2CScheduler.PRIO_HIGH)
+        # the worker is busy waiting with the bulk job. a high call from
+        # another thread still gets ahead of both bulk waiters
+        direct_high = _spawn(pwm.set_duty_cycle, 2, 25)
+        _until(lambda: bus.lock.waiting() == 3)
+    bulk.result(2), high.result(2)
+    direct.join(2), direct_high.join(2)
+    # high direct call, then bulk in arrival order, then the queued high job
+    assert order == [0x40, 0x48, 0x48, 0x40]
+    bus.close()
+
+
+def test_same_priority_is_fifo_and_lock_is_reentrant():
+    lock = NosI2CBusLock()
+    got = []
+    def worker(i):
+        with lock:
+            with lock: got.append(i)
+    with lock:
+        threads = []
+        for i in range(5):
+            threads.append(_spawn(worker, i))
+            _until(lambda: lock.waiting() == i + 1)
+    for t in threads: t.join(2)
+    assert got == list(range(5))
+
+
+def test_acquire_timeout_leaves_the_queue():
+    lock = NosI2CBusLock()
+    lock.acquire()
+    res = []
+    t = _spawn(lambda: res.append(lock.acquire(timeout=0.01)))
+    t.join(2)
+    assert res == [False]
+    assert lock.waiting() == 0
+    lock.release()
+    assert lock.acquire(blocking=False)
+    lock.release()
+
+
+def test_submit_racing_stop_always_resolves():
+    sched = NosI2CScheduler(NosI2CSim())
+    put, queued, go = sched._queue.put, threading.Event(), threading.Event()
+    def slow_put(item):
+        # a job's put stalls after submit has seen running, the sentinel's does not
+        if item[3] is not None:
+            queued.set()
+            go.wait(2)
+        put(item)
+    sched._queue.put = slow_put
+    futs = []
+    submitter = _spawn(lambda: futs.append(sched.submit(lambda: 1)))
+    assert queued.wait(2)
+    stopper = _spawn(sched.stop)
+    time.sleep(0.05)
+    go.set()
+    submitter.join(2)
+    stopper.join(2)
+    assert futs[0].result(timeout=2) == 1
@@ -0,0 +1,32 @@
+#===================================================================
+# file: test_sim.py
+# desc: the simulated bus runs every SMBus call against the models,
+#       block and process calls included.
+# dev : nos
+#===================================================================
+import errno
+
+import pytest
+
+from i2c.sim import NosI2CSim, SimRegisterDevice
+
+
+def test_block_and_process_calls_hit_the_model():
+    bus = NosI2CSim()
+    dev = bus.attach(SimRegisterDevice(0x50))
+
+    bus.write_block_data(0x50, 0x10, [1, 2, 3])
+    assert [dev.get_reg(r) for r in range(0x10, 0x14)] == [3, 1, 2, 3]
+    assert bus.read_block_data(0x50, 0x10) == [1, 2, 3]
+    # the reply is read on from where the request left the register pointer
+    for r, v in zip(range(0x24, 0x27), [2, 0xAA, 0xBB]): dev.set_reg(r, v)
+    assert bus.block_process_call(0x50, 0x20, [1, 2, 3]) == [0xAA, 0xBB]
+
+    dev.set_reg(0x32, 0x34)
+    dev.set_reg(0x33, 0x12)
+    assert bus.process_call(0x50, 0x30, 0xBEEF) == 0x1234
+    assert (dev.get_reg(0x30), dev.get_reg(0x31)) == (0xEF, 0xBE)
+
+    with pytest.raises(OSError) as e:
+        bus.read_block_data(0x50, 0x40)  # count byte 0
+    assert e.value.errno == errno.EPROTO
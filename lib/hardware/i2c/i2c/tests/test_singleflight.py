@@ -0,0 +1,55 @@
+#===================================================================
+# file: test_singleflight.py
+# desc: read coalescing never deadlocks the bus and never serves a
+#       value from before a write.
+# dev : nos
+#===================================================================
+import threading
+import time
+
+from i2c import NosI2CScheduler
+from i2c.sim import NosI2CSim, SimPCF8574
+from pcf8574 import PCF8574
+
+
+def _until(cond, timeout=2.0):
+    end = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < end, "timed out"
+        time.sleep(0.001)
+
+
+def _spawn(fn, *args):
+    t = threading.Thread(target=fn, args=args, daemon=True)
+    t.start()
+    return t
+
+
+def test_reader_holding_the_bus_does_not_join_a_waiting_flight():
+    bus = NosI2CSim(devices=[SimPCF8574(0x20)])
+    io = PCF8574(0x20, i2c=bus, coalesce=True)
+    with bus.lock:
+        # leader of the flight, waiting for the bus
+        leader = _spawn(io.read_byte)
+        _until(lambda: bus.lock.waiting() == 1)
+        # the worker gets the bus first and must not wait for the leader
+        fut = io.submit(io.read_byte, priority=NosI2CScheduler.PRIO_HIGH)
+        _until(lambda: bus.lock.waiting() == 2)
+    assert fut.result(2) == 0xFF
+    leader.join(2)
+    assert not leader.is_alive()
+    bus.close()
+
+
+
+def test_read_after_write_is_never_stale():
+    bus = NosI2CSim(devices=[SimPCF8574(0x20)])
+    io = PCF8574(0x20, i2c=bus, coalesce=True, max_staleness=5)
+    with bus.lock:
+        # a read of the old state, then a write, queued in that order
+        reader = _spawn(io.read_byte)
+        _until(lambda: bus.lock.waiting() == 1)
+        writer = _spawn(io.write_byte, 0x00)
+        _until(lambda: bus.lock.waiting() == 2)
+    reader.join(2), writer.join(2)
+    assert io.read_byte() == 0x00
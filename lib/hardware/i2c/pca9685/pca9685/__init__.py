@@ -1,2 +1,4 @@
 from .core import PCA9685
-__all__ = ["PCA9685"]
+from .frame import PCA9685Frame
+from .motion import PCA9685Motion, PROFILES, trapezoid
+__all__ = ["PCA9685", "PCA9685Frame", "PCA9685Motion", "PROFILES", "trapezoid"]
@@ -2,8 +2,11 @@
 # PCA9685
 # desc: 16 channel servo driver
 #===================================================================
-from i2c import NosI2CDevice, NosI2C
-import time
+from typing import Dict, List, Mapping, Optional, Tuple, Union
+from i2c import NosI2CDevice, NosI2C, NosI2CScheduler, NosI2CTransaction
+from i2c.shadow import coalesce
+from i2c.sim import NosI2CSim, SimPCA9685
+from .frame import PCA9685Frame
 
 
 class PCA9685(NosI2CDevice):
@@ -15,6 +18,7 @@ class PCA9685(NosI2CDevice):
 
     Attributes:
         MOCK (bool): True if running without actual I2C hardware.
+            Mock devices run against the i2c simulator.
         REG_* (int): Register addresses for PWM channels and control.
     """
 
@@ -30,6 +34,21 @@ class PCA9685(NosI2CDevice):
     REG_MODE1: int    = 0x00  # Mode register 1 (sleep, restart, etc.)
     REG_PRESCALE: int = 0xFE  # Prescale register for PWM frequency
 
+    # bit 4 of ON_H / OFF_H. as a count: FULL_ON is on=4096, FULL_OFF is off=4096
+    FULL: int = 0x1000
+
+    # MODE1 bits
+    MODE1_RESTART: int = 0x80
+    MODE1_AI: int      = 0x20  # register auto-increment
+    MODE1_SLEEP: int   = 0x10
+
+    # MODE1 restart/sleep bits are changed by the chip itself
+    VOLATILE_REGS: tuple = (REG_MODE1,)
+    # MODE1 AI bit is kept on, so channel registers are block accessed
+    AUTO_INCREMENT: bool = True
+    # servo/pwm updates jump ahead of bulk work on a shared bus
+    PRIORITY: int = NosI2CScheduler.PRIO_HIGH
+
     def __init__(self, addr: int = 0x40, **kwargs):
         """
         Initialize the PCA9685 device.
@@ -39,22 +58,66 @@ class PCA9685(NosI2CDevice):
             **kwargs: Additional parameters for the base NosI2CDevice.
 
         Notes:
-            - In MOCK mode, the device does not attempt I2C initialization.
-            - Otherwise, calls the base NosI2CDevice constructor.
+            - In MOCK mode without an explicit i2c, the device is backed by
+              a SimPCA9685 model on the simulated bus.
         """
-        if PCA9685.MOCK:
-            # Skip hardware initialization if running in mock mode
-            return
+        if PCA9685.MOCK and kwargs.get("i2c") is None:
+            sim = NosI2CSim.mock(kwargs.pop("bus", 1))
+            if addr not in sim.devices: sim.attach(SimPCA9685(addr))
+            kwargs["i2c"] = sim
 
         # Initialize the base I2C device with the given address
         super().__init__(addr, **kwargs)
+        # MODE1 AI known to be set. power on default is off
+        self._ai: bool = False
+        self._frame: Optional[PCA9685Frame] = None
+        # set AI right away, so block reads that bypass the driver (raw
+        # transactions, other processes) don't see the first register repeated
+        try:
+            self._ensure_ai()
+        except OSError:
+            # not answering yet. the first block access through the driver retries
+            pass
+
+    @property
+    def frame(self) -> PCA9685Frame:
+        """
+        Staged register image for frame based updates, created on first use.
+
+        Notes:
+            - set_*() on the frame only stage, commit() writes what changed.
+            - Writes through set_pwm()/set_pwm_many() keep the image in sync.
+        """
+        if self._frame is None: self._frame = PCA9685Frame(self)
+        return self._frame
+
+    def _ensure_ai(self):
+        """ turn on MODE1 auto-increment once, before the first block access """
+        if self._ai: return
+        with self.locked():
+            if self._ai: return
+            mode1 = self.i2c.read_byte_data(self.addr, self.REG_MODE1)
+            if not mode1 & self.MODE1_AI:
+                # writing RESTART back as 1 would restart the outputs
+                self.i2c.write_byte_data(self.addr, self.REG_MODE1, (mode1 & ~self.MODE1_RESTART) | self.MODE1_AI)
+            self._ai = True
+
+    def transaction(self, chunk: Optional[int] = None) -> NosI2CTransaction:
+        self._ensure_ai()
+        return super().transaction(chunk)
+    def _write_reg(self, reg: int, value: Union[int, List[int]]):
+        if not isinstance(value, int): self._ensure_ai()
+        super()._write_reg(reg, value)
+    def _read_reg_wire(self, reg: int, amnt=1):
+        if amnt > 1: self._ensure_ai()
+        return super()._read_reg_wire(reg, amnt)
 
         
     def reset(self):
         """
         Reset the PCA9685 device.
 
-        This clears the MODE1 register and sets the chip to its default state.
+        This clears the MODE1 register (except AI) and sets the chip to its default state.
         All PWM channels will be turned off, and the internal 12-bit counter
         will start from 0.
 
@@ -62,11 +125,12 @@ class PCA9685(NosI2CDevice):
             - Typical use: called during initialization to ensure a known state.
             - Waits 200ms to allow the device to stabilize after reset.
         """
-        # Write 0x00 to MODE1 register to reset the chip
-        self.write_reg_byte(self.REG_MODE1, 0x00)
+        # Clear MODE1, keep auto-increment on
+        self.write_reg_byte(self.REG_MODE1, self.MODE1_AI)
+        self._ai = True
         
         # Delay to allow reset to take effect
-        time.sleep(0.2)
+        self.i2c.sleep(0.2)
 
 
     def restart(self):
@@ -80,11 +144,12 @@ class PCA9685(NosI2CDevice):
             - Typically called after changing prescale (frequency) or exiting sleep.
             - Waits 200ms to allow the device to stabilize after restart.
         """
-        # Write 0x80 to MODE1 register to set the RESTART bit
-        self.write_reg_byte(self.REG_MODE1, 0x80)
+        # Set the RESTART bit in MODE1, keep auto-increment on
+        self.write_reg_byte(self.REG_MODE1, self.MODE1_RESTART | self.MODE1_AI)
+        self._ai = True
         
         # Delay to allow restart to complete
-        time.sleep(0.2)
+        self.i2c.sleep(0.2)
 
     def set_freq(self, freq: float):
         """
@@ -104,16 +169,13 @@ class PCA9685(NosI2CDevice):
         # Calculate prescale value from datasheet formula
         pre = int((25_000_000 / (4096 * freq)) - 1)
 
-        if PCA9685.MOCK:
-            self.__mock["freq"] = freq
-            return
-
-        # Enter sleep mode to allow prescale update
-        self.write_reg_byte(self.REG_MODE1, 0x10)
-        # Write prescale value
-        self.write_reg_byte(self.REG_PRESCALE, pre)
-        # Restart the device
-        self.restart()
+        with self.locked():
+            # Enter sleep mode to allow prescale update
+            self.write_reg_byte(self.REG_MODE1, self.MODE1_SLEEP | self.MODE1_AI)
+            # Write prescale value
+            self.write_reg_byte(self.REG_PRESCALE, pre)
+            # Restart the device
+            self.restart()
 
     def set_pwm(self,ch:int,on:int,off:int):
         """
@@ -124,30 +186,68 @@ class PCA9685(NosI2CDevice):
 
         Parameters:
             ch (int): Channel number (0–15)
-            on (int): Counter value to start the pulse (0–4095)
-            off (int): Counter value to end the pulse (0–4095)
+            on (int): Counter value to start the pulse (0–4095), 4096 for FULL_ON
+            off (int): Counter value to end the pulse (0–4095), 4096 for FULL_OFF
 
         Notes:
             - Wraparound is handled by the hardware if off < on.
-            - For 100% duty cycle, use on=0, off=4095 or set FULL_ON bit.
-            - For 0% duty cycle, use on=0, off=0 or set FULL_OFF bit.
+            - For 100% duty cycle, use on=4096, off=0 (FULL_ON bit).
+            - For 0% duty cycle, use on=0, off=4096 (FULL_OFF bit).
         """
         # Validate inputs
         assert 0 <= ch < 16, "Channel must be 0–15"
-        assert 0 <= on <= 0x0FFF, "on should be 0–4095"
-        assert 0 <= off <= 0x0FFF, "off should be 0–4095"
+        assert 0 <= on <= self.FULL, "on should be 0–4096"
+        assert 0 <= off <= self.FULL, "off should be 0–4096"
 
-        # Calculate base register for this channel
+        # ON_L, ON_H, OFF_L, OFF_H in one block write
         reg = self.REG_PWM1_ON_L + ch * 4
+        data = self._pwm_bytes(on, off)
+        self.write_reg_byte(reg, data)
+        if self._frame is not None: self._frame._written({reg + i: v for i, v in enumerate(data)})
 
-        # Write the 12-bit ON count to two registers (low + high byte)
-        self.write_reg_byte(reg + 0, on & 0xFF)
-        self.write_reg_byte(reg + 1, on >> 8)
+    @staticmethod
+    def _pwm_bytes(on: int, off: int) -> List[int]:
+        """ register bytes of a channel, ON_L ON_H OFF_L OFF_H """
+        return [on & 0xFF, on >> 8, off & 0xFF, off >> 8]
 
-        # Write the 12-bit OFF count to two registers (low + high byte)
-        self.write_reg_byte(reg + 2, off & 0xFF)
-        self.write_reg_byte(reg + 3, off >> 8)
-        
+    def set_pwm_many(self, values: Mapping[int, Tuple[int, int]]):
+        """
+        Set the ON and OFF counts of several channels at once.
+
+        Parameters:
+            values (Mapping[int, Tuple[int, int]]): {channel: (on, off)}.
+
+        Notes:
+            - Runs of adjacent channels become one block write each and all
+              runs go out in one transaction. 16 channels are one ioctl.
+            - With a register shadow enabled the writes are staged and
+              flushed together instead.
+        """
+        regs: Dict[int, int] = {}
+        for ch, (on, off) in values.items():
+            assert 0 <= ch < 16, "Channel must be 0–15"
+            assert 0 <= on <= self.FULL, "on should be 0–4096"
+            assert 0 <= off <= self.FULL, "off should be 0–4096"
+            base = self.REG_PWM1_ON_L + ch * 4
+            for i, v in enumerate(self._pwm_bytes(on, off)): regs[base + i] = v
+        if not regs: return
+
+        self._write_blocks([(start, [regs[r] for r in range(start, start + n)]) for start, n in coalesce(regs)])
+        if self._frame is not None: self._frame._written(regs)
+
+    def _write_blocks(self, blocks: List[Tuple[int, List[int]]]):
+        """ write (reg, data) blocks in one transaction, or through the shadow if enabled """
+        if self.shadow is not None:
+            with self.deferred():
+                for reg, data in blocks: self.write_reg_byte(reg, data)
+            return
+        if len(blocks) == 1 and len(blocks[0][1]) <= 32:
+            self._write_reg(*blocks[0])
+            return
+        with self._writing():
+            t = self.transaction()
+            for reg, data in blocks: t.write_reg(reg, data)
+            t.submit()
 
     def set_duty_cycle(self, ch: int, duty: float, shift: float = 0):
         """
@@ -165,8 +265,15 @@ class PCA9685(NosI2CDevice):
             - For 100% duty cycle, duty=100 will generate a full ON pulse.
             - For 0% duty cycle, duty=0 will generate a full OFF pulse.
         """
-        # Validate inputs
+        # Validate inputs. duty/shift are checked by _duty_to_pwm
         assert 0 <= ch < 16, "Channel must be 0–15"
+
+        # Apply the PWM settings
+        self.set_pwm(ch, *self._duty_to_pwm(duty, shift))
+
+    @staticmethod
+    def _duty_to_pwm(duty: float, shift: float = 0) -> Tuple[int, int]:
+        """ duty/shift percent to (on, off) counts """
         assert 0 <= duty <= 100, "Duty should be 0–100"
         assert 0 <= shift <= 100, "Shift should be 0–100"
         assert duty + shift <= 100, "Duty + shift must be <= 100%"
@@ -178,9 +285,23 @@ class PCA9685(NosI2CDevice):
         # Compute ON/OFF counts (wraparound automatically handled)
         on = shift_count & 0x0FFF
         off = (on + duty_count) & 0x0FFF
+        return on, off
 
-        # Apply the PWM settings
-        self.set_pwm(ch, on, off)
+    def set_duty_cycles(self, duties: Mapping[int, Union[float, Tuple[float, float]]]):
+        """
+        Set the duty cycle of several channels at once.
+
+        Parameters:
+            duties (Mapping): {channel: duty} or {channel: (duty, shift)}, percent.
+
+        Notes:
+            - Same as set_duty_cycle() per channel, written like set_pwm_many().
+        """
+        values = {}
+        for ch, d in duties.items():
+            duty, shift = (d, 0) if isinstance(d, (int, float)) else d
+            values[ch] = self._duty_to_pwm(duty, shift)
+        self.set_pwm_many(values)
 
     def get_pwm(self, ch: int)->tuple[int,int]:
         """
@@ -192,38 +313,38 @@ class PCA9685(NosI2CDevice):
         Returns:
             tuple: (on, off) — 12-bit counter values indicating when the output
                 goes HIGH (on) and LOW (off) during the PWM cycle.
+                FULL_ON reads as (4096, 0), FULL_OFF as (0, 4096), as set_pwm() takes them.
 
         Notes:
             - Each channel has a 12-bit counter (0–4095) that repeats continuously.
             - The ON/OFF counts determine the PWM pulse: 
                 output HIGH when counter == ON, 
                 output LOW when counter == OFF.
-            - Values are read from the following registers:
-                ON_L, ON_H, OFF_L, OFF_H
-            - Wraparound is handled automatically by the PCA9685.
-            - For 100% duty cycle, the FULL_ON bit may be set, but this method
-            will return the raw register values (you may need separate logic to interpret FULL_ON / FULL_OFF flags).
-            - This method can also be used in MOCK mode to inspect simulated PWM values.
+            - ON_L, ON_H, OFF_L, OFF_H are read in one block read.
+            - FULL_OFF wins over FULL_ON, as on the chip.
+            - In MOCK mode this reads back the simulated registers.
         """
         # Validate channel
         assert 0 <= ch < 16, "Channel must be 0–15"
-
-        # Base register for this channel
-        base = self.REG_PWM1_ON_L + ch * 4
-
-        # Read 12-bit ON count
-        on_l  = self.read_reg_byte(base + 0)
-        on_h  = self.read_reg_byte(base + 1)
-
-        # Read 12-bit OFF count
-        off_l = self.read_reg_byte(base + 2)
-        off_h = self.read_reg_byte(base + 3)
-
-        # Combine low/high bytes into 12-bit counts
-        on  = (on_h << 8) | on_l
-        off = (off_h << 8) | off_l
-
-        return (on, off)
+        return self._decode_pwm(self.read_reg_byte(self.REG_PWM1_ON_L + ch * 4, 4))
+
+    @classmethod
+    def _decode_pwm(cls, regs: List[int]) -> Tuple[int, int]:
+        """ ON_L ON_H OFF_L OFF_H to (on, off), FULL_ON/FULL_OFF as 4096 """
+        on_l, on_h, off_l, off_h = regs
+        if off_h & 0x10: return (0, cls.FULL)
+        if on_h & 0x10: return (cls.FULL, 0)
+        return ((on_h & 0x0F) << 8 | on_l, (off_h & 0x0F) << 8 | off_l)
+
+    @classmethod
+    def _pwm_to_duty(cls, on: int, off: int) -> Tuple[float, float]:
+        """ (on, off) counts to (duty, shift) percent """
+        if off == cls.FULL: return (0.0, 0.0)
+        if on == cls.FULL: return (100.0, 0.0)
+        # If off < on, pulse wraps past 4095, so we use modulo 4096
+        duty_count = (off - on) & 0x0FFF
+        # Convert to percentage of the full 12-bit cycle
+        return (duty_count / 4095 * 100, on / 4095 * 100)
 
     def get_duty_cycle(self, ch: int)->tuple[float,float]:
         """
@@ -238,29 +359,32 @@ class PCA9685(NosI2CDevice):
                 - shift: phase shift as percentage of the PWM cycle (0–100%)
 
         Notes:
-            - This uses the raw ON/OFF counts from the PCA9685 registers.
             - Wraparound is handled automatically.
-            - For FULL_ON or FULL_OFF bits, this will return approximate values 
-            based on the register counts. For exact detection, additional checks
-            for FULL_ON/FULL_OFF would be needed.
+            - FULL_ON reads as (100, 0), FULL_OFF as (0, 0).
         """
         # Validate channel
         assert 0 <= ch < 16, "Channel must be 0–15"
+        return self._pwm_to_duty(*self.get_pwm(ch))
 
-        # Read raw ON/OFF 12-bit counts
-        on, off = self.get_pwm(ch)
-
-        # Compute duty count, handling wraparound
-        # If off < on, pulse wraps past 4095, so we use modulo 4096
-        duty_count = (off - on) & 0x0FFF
+    def get_all_pwm(self) -> List[Tuple[int, int]]:
+        """
+        Read the (on, off) counts of all 16 channels.
 
-        # Convert to percentage of the full 12-bit cycle
-        duty = duty_count / 4095 * 100
+        Returns:
+            List[Tuple[int, int]]: (on, off) per channel, decoded like get_pwm().
 
-        # Compute phase shift as percentage of the full cycle
-        shift = on / 4095 * 100
+        Notes:
+            - The 64 LED registers are one auto-increment block read, one
+              transaction instead of 64 single reads.
+        """
+        regs = self.read_reg_byte(self.REG_PWM1_ON_L, 64)
+        return [self._decode_pwm(regs[i:i + 4]) for i in range(0, 64, 4)]
 
-        return duty, shift
+    def get_all_duty_cycles(self) -> List[Tuple[float, float]]:
+        """
+        Read (duty, shift) in percent of all 16 channels in one transaction.
+        """
+        return [self._pwm_to_duty(on, off) for on, off in self.get_all_pwm()]
 
 
 if __name__ == "__main__":
@@ -0,0 +1,138 @@
+#===================================================================
+# file: frame.py
+# desc: frame based updates for the PCA9685. channel values are staged
+#       in a local image of the LED registers and commit() writes only
+#       the registers that changed, merged into block writes.
+# dev : nos
+#===================================================================
+from typing import Dict, List, Mapping, Optional, Tuple, Union
+
+from i2c.shadow import coalesce
+
+
+class PCA9685Frame:
+    """
+    Staged register image of the 16 PCA9685 channels.
+
+    set_*() only touch the image. commit() diffs it against what the chip
+    was last sent, merges adjacent changed registers into block writes
+    and sends them all in one transaction. Outputs change together at the
+    STOP that ends it.
+
+    Example:
+        with pca.frame as f:
+            for ch in range(16): f.set_duty_cycle(ch, pos[ch])
+        # only channels whose value changed were written
+
+    Attributes:
+        device (PCA9685): Board the frame is committed to.
+        commits (int): commit() calls that wrote something.
+        written (int): Registers written by commits.
+        skipped (int): Staged registers not written since they were unchanged.
+    """
+
+    LEN: int = 64  # 16 channels * ON_L ON_H OFF_L OFF_H
+
+    def __init__(self, device):
+        """
+        Args:
+            device (PCA9685): Board to commit to.
+        """
+        self.device = device
+        # last value sent per LED register, None if unknown
+        self._image: List[Optional[int]] = [None] * self.LEN
+        # register offset -> staged value
+        self._staged: Dict[int, int] = {}
+        self.commits: int = 0
+        self.written: int = 0
+        self.skipped: int = 0
+
+    def __enter__(self) -> "PCA9685Frame":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None: self.commit()
+        else: self.discard()
+
+    # -----------------------------
+    # stage
+    # -----------------------------
+    def set_pwm(self, ch: int, on: int, off: int) -> "PCA9685Frame":
+        """ stage (on, off) counts for a channel, as PCA9685.set_pwm() """
+        dev = self.device
+        assert 0 <= ch < 16, "Channel must be 0–15"
+        assert 0 <= on <= dev.FULL, "on should be 0–4096"
+        assert 0 <= off <= dev.FULL, "off should be 0–4096"
+        for i, v in enumerate(dev._pwm_bytes(on, off)):
+            self._staged[ch * 4 + i] = v
+        return self
+
+    def set_duty_cycle(self, ch: int, duty: float, shift: float = 0) -> "PCA9685Frame":
+        """ stage a duty cycle for a channel, as PCA9685.set_duty_cycle() """
+        return self.set_pwm(ch, *self.device._duty_to_pwm(duty, shift))
+
+    def set_duty_cycles(self, duties: Mapping[int, Union[float, Tuple[float, float]]]) -> "PCA9685Frame":
+        """ stage {channel: duty or (duty, shift)} """
+        for ch, d in duties.items():
+            duty, shift = (d, 0) if isinstance(d, (int, float)) else d
+            self.set_duty_cycle(ch, duty, shift)
+        return self
+
+    def discard(self) -> None:
+        """ drop staged values """
+        self._staged.clear()
+
+    # -----------------------------
+    # commit
+    # -----------------------------
+    def dirty(self) -> List[int]:
+        """ staged register offsets that differ from what the chip was sent """
+        return sorted(r for r, v in self._staged.items() if self._image[r] != v)
+
+    def commit(self) -> int:
+        """
+        Write the changed registers.
+
+        Returns:
+            int: Registers written. 0 if nothing changed, then nothing is sent.
+
+        Notes:
+            - On a bus error the written registers are marked unknown, so the
+              next commit sends them again.
+        """
+        dev = self.device
+        with dev.locked():
+            staged, self._staged = self._staged, {}
+            dirty = [r for r in sorted(staged) if self._image[r] != staged[r]]
+            self.skipped += len(staged) - len(dirty)
+            if not dirty: return 0
+
+            base = dev.REG_PWM1_ON_L
+            blocks = [(base + start, [staged[r] for r in range(start, start + n)]) for start, n in coalesce(dirty)]
+            try:
+                dev._write_blocks(blocks)
+            except OSError:
+                for r in dirty: self._image[r] = None
+                raise
+            for r in dirty: self._image[r] = staged[r]
+        self.commits += 1
+        self.written += len(dirty)
+        return len(dirty)
+
+    # -----------------------------
+    # image
+    # -----------------------------
+    def _written(self, regs: Mapping[int, int]) -> None:
+        """ LED registers written outside the frame, by absolute register """
+        base = self.device.REG_PWM1_ON_L
+        for reg, v in regs.items():
+            if 0 <= reg - base < self.LEN: self._image[reg - base] = v
+
+    def load(self) -> None:
+        """ read the chip's LED registers into the image, one block read """
+        regs = self.device.read_reg_byte(self.device.REG_PWM1_ON_L, self.LEN)
+        self._image = list(regs)
+
+    def invalidate(self) -> None:
+        """ forget what the chip holds. the next commit writes every staged register """
+        self._image = [None] * self.LEN
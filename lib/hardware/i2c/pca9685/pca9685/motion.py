@@ -0,0 +1,295 @@
+#===================================================================
+# file: motion.py
+# desc: servo trajectory engine for PCA9685 channels. moves are
+#       interpolated on a fixed rate clock with absolute deadlines and
+#       every board gets one frame commit per tick.
+# dev : nos
+#===================================================================
+import math
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from i2c import NosI2CDeviceGroup, NosI2CGrid
+
+from .core import PCA9685
+
+
+# -----------------------------
+# profiles. progress u in [0, 1] -> position in [0, 1]
+# -----------------------------
+def linear(u: float) -> float:
+    return u
+
+def ease_in(u: float) -> float:
+    return u * u
+
+def ease_out(u: float) -> float:
+    return u * (2 - u)
+
+def ease_in_out(u: float) -> float:
+    """ cosine ease, zero velocity at both ends """
+    return 0.5 - 0.5 * math.cos(math.pi * u)
+
+def trapezoid(accel: float = 0.25) -> Callable[[float], float]:
+    """
+    Trapezoidal velocity: constant acceleration, cruise, constant deceleration.
+
+    Args:
+        accel (float): Fraction of the move spent accelerating (and again
+            decelerating), 0 < accel <= 0.5.
+    """
+    assert 0 < accel <= 0.5, "accel must be in (0, 0.5]"
+    v = 1 / (1 - accel)
+
+    def profile(u: float) -> float:
+        if u < accel: return 0.5 * v / accel * u * u
+        if u <= 1 - accel: return v * (u - 0.5 * accel)
+        return 1 - 0.5 * v / accel * (1 - u) ** 2
+    return profile
+
+PROFILES: Dict[str, Callable[[float], float]] = {
+    "linear": linear,
+    "ease_in": ease_in,
+    "ease_out": ease_out,
+    "ease_in_out": ease_in_out,
+    "trapezoid": trapezoid(),
+}
+
+
+class _Move:
+    __slots__ = ("start", "target", "t0", "duration", "profile")
+
+    def __init__(self, start: float, target: float, t0: float, duration: float, profile: Callable[[float], float]):
+        self.start = start
+        self.target = target
+        self.t0 = t0
+        self.duration = duration
+        self.profile = profile
+
+    def at(self, t: float) -> Tuple[float, bool]:
+        """ (position, done) at time t """
+        if self.duration <= 0 or t >= self.t0 + self.duration: return self.target, True
+        u = max(0.0, (t - self.t0) / self.duration)
+        return self.start + (self.target - self.start) * self.profile(u), False
+
+
+class PCA9685Motion:
+    """
+    Fixed rate trajectory engine for servo channels on any number of boards.
+
+    Positions are duty cycles in percent, as set_duty_cycle(). Every tick
+    the engine evaluates all active moves at the tick's deadline, stages
+    them in each board's frame and commits: one transaction per board,
+    with unchanged registers skipped. Boards on different buses commit in
+    parallel.
+
+    Example:
+        motion = PCA9685Motion(rate=50).start()
+        motion.set(pca, 0, 7.5)
+        motion.move(pca, 0, 10.0, 1.5, "ease_in_out")
+        motion.wait()
+
+    Attributes:
+        rate (float): Ticks per second.
+        grid (NosI2CGrid): Deadline grid of the tick thread. frames, overruns,
+            jitter_max and busy_max are read from it.
+        errors (int): Ticks where a commit failed.
+        last_error (Exception | None): Error of the last failed tick.
+    """
+
+    def __init__(self, rate: float = 50.0):
+        """
+        Args:
+            rate (float): Ticks per second. 50 matches a servo PWM period.
+        """
+        assert rate > 0, "rate must be > 0"
+        self.rate: float = rate
+        self._pos: Dict[Tuple[int, int], float] = {}
+        self._moves: Dict[Tuple[int, int], _Move] = {}
+        self._devices: Dict[int, PCA9685] = {}
+        self._cv = threading.Condition()
+        self._stop = False
+        self._thread: Optional[threading.Thread] = None
+
+        self.grid: NosI2CGrid = NosI2CGrid(1.0 / rate)
+        self.errors: int = 0
+        self.last_error: Optional[BaseException] = None
+
+    def __enter__(self) -> "PCA9685Motion":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    # -----------------------------
+    # commands
+    # -----------------------------
+    def _key(self, device: PCA9685, ch: int) -> Tuple[int, int]:
+        assert 0 <= ch < 16, "Channel must be 0–15"
+        self._devices[id(device)] = device
+        return (id(device), ch)
+
+    def set(self, device: PCA9685, ch: int, pos: float) -> None:
+        """ jump to a position on the next tick, cancelling any move """
+        assert 0 <= pos <= 100, "Position should be 0–100"
+        with self._cv:
+            key = self._key(device, ch)
+            self._moves[key] = _Move(pos, pos, 0.0, 0.0, linear)
+            self._cv.notify_all()
+
+    def move(self, device: PCA9685, ch: int, target: float, duration: float,
+             profile: Union[str, Callable[[float], float]] = "linear") -> None:
+        """
+        Move a channel to a position.
+
+        Args:
+            device (PCA9685): Board.
+            ch (int): Channel (0–15).
+            target (float): Position, duty cycle percent.
+            duration (float): Seconds the move takes.
+            profile (str | Callable): Name in PROFILES, or a function of progress
+                u in [0, 1] returning position in [0, 1].
+
+        Notes:
+            - Starts from where the channel is now, mid-move included.
+            - A channel never positioned jumps straight to target.
+        """
+        assert 0 <= target <= 100, "Position should be 0–100"
+        assert duration >= 0, "duration must be >= 0"
+        if isinstance(profile, str): profile = PROFILES[profile]
+        now = time.monotonic()
+        with self._cv:
+            key = self._key(device, ch)
+            cur = self._moves.get(key)
+            start = cur.at(now)[0] if cur is not None else self._pos.get(key)
+            if start is None: start, duration = target, 0.0
+            self._moves[key] = _Move(start, target, now, duration, profile)
+            self._cv.notify_all()
+
+    def position(self, device: PCA9685, ch: int) -> Optional[float]:
+        """ last position sent for a channel, None if never positioned """
+        with self._cv:
+            return self._pos.get((id(device), ch))
+
+    @property
+    def busy(self) -> bool:
+        """ True while any move is running """
+        with self._cv:
+            return bool(self._moves)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """ wait until every move finished. False on timeout """
+        with self._cv:
+            return self._cv.wait_for(lambda: not self._moves or self._stop, timeout)
+
+    # -----------------------------
+    # thread
+    # -----------------------------
+    def start(self) -> "PCA9685Motion":
+        """ start the tick thread (non-blocking) """
+        if self._thread is not None and self._thread.is_alive(): return self
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, daemon=True, name="pca9685-motion")
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """ stop ticking. channels hold their last position """
+        with self._cv:
+            self._stop = True
+            self._cv.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _stopped(self, wait: float) -> bool:
+        with self._cv:
+            return self._cv.wait_for(lambda: self._stop, wait)
+
+    def _run(self) -> None:
+        grid = self.grid
+        grid.resume()
+        while True:
+            with self._cv:
+                # idle until there is something to move
+                while not self._stop and not self._moves:
+                    self._cv.wait()
+                    grid.resume()
+                if self._stop: return
+            if not grid.wait(self._stopped): return
+            grid.begin()
+            self.tick(grid.deadline)
+            grid.end()
+
+    def tick(self, t: Optional[float] = None) -> int:
+        """
+        Run one tick: evaluate moves at time t and commit every board.
+
+        Returns:
+            int: Registers written.
+        """
+        if t is None: t = time.monotonic()
+        with self._cv:
+            frames: Dict[int, List[Tuple[int, float]]] = {}
+            for key, m in list(self._moves.items()):
+                pos, done = m.at(t)
+                self._pos[key] = pos
+                frames.setdefault(key[0], []).append((key[1], pos))
+                if done: del self._moves[key]
+            if not self._moves: self._cv.notify_all()
+
+        # stage and commit outside the motion lock, so set()/move()/wait()
+        # callers never wait behind a bus write
+        written = 0
+        if frames:
+            boards = [self._devices[d] for d in frames]
+            for dev in boards:
+                for ch, pos in frames[id(dev)]: dev.frame.set_duty_cycle(ch, pos)
+            try:
+                group = NosI2CDeviceGroup(boards)
+                if len(group.buses()) > 1:
+                    written = sum(group.call(lambda d: d.frame.commit()))
+                else:
+                    written = sum(d.frame.commit() for d in boards)
+            except Exception as e:
+                # keep ticking. the error is counted and kept for stats
+                self.errors += 1
+                self.last_error = e
+        return written
+
+    @property
+    def frames(self) -> int:
+        return self.grid.frames
+
+    @property
+    def overruns(self) -> int:
+        return self.grid.overruns
+
+    @property
+    def jitter_max(self) -> float:
+        return self.grid.jitter_max
+
+    @property
+    def busy_max(self) -> float:
+        return self.grid.busy_max
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Timing of the tick loop.
+
+        Returns:
+            Dict[str, float]: {"rate", "frames", "overruns", "errors", "moves",
+                "jitter_max", "busy_max", "last_error"}, times in seconds.
+        """
+        with self._cv:
+            moves = len(self._moves)
+        return {
+            "rate": self.rate,
+            "frames": self.frames,
+            "overruns": self.overruns,
+            "errors": self.errors,
+            "moves": moves,
+            "jitter_max": self.jitter_max,
+            "busy_max": self.busy_max,
+            "last_error": self.last_error,
+        }
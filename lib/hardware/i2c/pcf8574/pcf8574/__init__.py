@@ -1,2 +1,4 @@
 from .core import PCF8574
-__all__ = ["PCF8574"]
+from .monitor import PCF8574Monitor
+from .port import PCF8574Port
+__all__ = ["PCF8574", "PCF8574Monitor", "PCF8574Port"]
@@ -1,9 +1,11 @@
 #===================================================================
 # PCF8574
-# desc: I2C io expansion has interrupt pin but not handled yet
+# desc: I2C io expansion. INT line handled by PCF8574Monitor (monitor.py)
 #===================================================================
-from typing import Union, List
-from i2c import NosI2CDevice, NosI2C
+import time
+from typing import Optional, Sequence, Union, List
+from i2c import NosI2CDevice, NosI2C, NosI2CTransaction
+from i2c.sim import NosI2CSim, SimPCF8574
 
 # byte |= 1 << p      # high
 # byte &= ~(1 << p)   # low
@@ -14,28 +16,41 @@ class PCF8574(NosI2CDevice):
     Driver for the PCF8574 I2C I/O expander.
 
     Provides 8 GPIO pins over I2C with optional inversion and mock support.
+
+    The output latch is shadowed on the host, so pin changes are a single
+    write with no read. Pins used as inputs are always written high, which
+    the quasi-bidirectional port needs to read them.
     
     Attributes:
         MOCK (bool): True if running without actual I2C hardware.
+            Mock devices run against the i2c simulator.
     """
 
     MOCK = not NosI2C.HAS_I2C
 
-    def __init__(self, addr: int = 0x20, invert: bool = False, **kwargs):
+    def __init__(self, addr: int = 0x20, invert: bool = False, inputs: int = 0x00, **kwargs):
         """
         Initialize the PCF8574 device.
 
         Args:
             addr (int): I2C address of the device (default 0x20).
             invert (bool): Invert logic levels if True (default False).
+            inputs (int): Bit mask of pins used as inputs (default none).
             **kwargs: Additional parameters for the base NosI2CDevice.
+
+        Notes:
+            - In MOCK mode without an explicit i2c, the device is backed by
+              a SimPCF8574 model on the simulated bus.
         """
-        self.__mock: int = 0xFF  # Mock state (all pins HIGH by default)
         self.__invert: bool = invert
+        self.inputs: int = inputs & 0xFF
+        # raw output latch as last written. None until known
+        self.__latch: Optional[int] = None
 
-        if PCF8574.MOCK:
-            # Skip hardware initialization in mock mode
-            return
+        if PCF8574.MOCK and kwargs.get("i2c") is None:
+            sim = NosI2CSim.mock(kwargs.pop("bus", 1))
+            if addr not in sim.devices: sim.attach(SimPCF8574(addr))
+            kwargs["i2c"] = sim
 
         # Initialize the base I2C device
         super().__init__(addr, **kwargs)
@@ -49,9 +64,8 @@ class PCF8574(NosI2CDevice):
 
         Notes:
             - Applies inversion if self.__invert is True.
-            - Returns self.__mock in MOCK mode.
         """
-        res: int = self.__mock if PCF8574.MOCK else super().read_byte()
+        res: int = super().read_byte()
         if self.__invert:
             res ^= 0xFF  # Invert all bits
         return res
@@ -65,17 +79,117 @@ class PCF8574(NosI2CDevice):
 
         Notes:
             - Applies inversion if self.__invert is True.
-            - Updates self.__mock in MOCK mode.
+            - Input pins are written high regardless of value.
         """
         if self.__invert:
             value ^= 0xFF
-
-        if PCF8574.MOCK:
-            self.__mock = value & 0xFF
-        else:
-            super().write_byte(value)
+        self.__write_raw(value)
     byte = property(read_byte, write_byte)
 
+    def __write_raw(self, raw: int) -> None:
+        raw = (raw | self.inputs) & 0xFF
+        super().write_byte(raw)
+        self.__latch = raw
+
+    def __raw_latch(self) -> int:
+        if self.__latch is None:
+            # unknown after start up. the port reads back the latch for
+            # output pins. one read, then the shadow is authoritative
+            self.__latch = (super().read_byte() | self.inputs) & 0xFF
+        return self.__latch
+
+    @property
+    def latch(self) -> int:
+        """
+        Output latch as last written, inversion applied.
+
+        Notes:
+            - Unlike read_byte() this is not read from the port.
+        """
+        raw = self.__raw_latch()
+        return raw ^ 0xFF if self.__invert else raw
+
+    def sync(self) -> int:
+        """ re-read the port into the latch shadow, ie after another master wrote it """
+        self.__latch = None
+        return self.latch
+
+    def set_pins(self, mask: int, values: int) -> None:
+        """
+        Set any number of pins in one write.
+
+        Args:
+            mask (int): Pins to change, bit per pin.
+            values (int): New levels for the pins in mask (1=HIGH, 0=LOW).
+
+        Notes:
+            - Nothing is written if no pin changes.
+            - Input pins in mask are ignored, they stay high.
+        """
+        # shadow read-modify-write must not race other threads
+        with self.locked():
+            raw = self._plan(mask, values)
+            if raw is not None:
+                self.__write_raw(raw)
+
+    def _plan(self, mask: int, values: int) -> Optional[int]:
+        """ raw byte set_pins() would write, None if no pin changes. call with the lock held """
+        mask &= ~self.inputs & 0xFF
+        latch = self.latch
+        new = (latch & ~mask) | (values & mask)
+        if new == latch: return None
+        if self.__invert: new ^= 0xFF
+        return (new | self.inputs) & 0xFF
+
+    def _latched(self, raw: int) -> None:
+        """ record a raw byte written outside write_byte(), ie in a transaction """
+        self._wrote()
+        self.__latch = raw & 0xFF
+
+    def modify(self, clear: int = 0x00, set: int = 0x00) -> None:
+        """
+        Clear then set pins in one write.
+
+        Args:
+            clear (int): Pins to drive LOW.
+            set (int): Pins to drive HIGH. Wins over clear.
+        """
+        self.set_pins(clear | set, set)
+
+    def stream(self, states: Union[bytes, Sequence[int]], repeat: int = 1, chunk: Optional[int] = None) -> float:
+        """
+        Output a sequence of port states at bus speed.
+
+        The chip latches every byte of a write, so the whole sequence goes
+        out as one long write (split into messages of ``chunk`` bytes and
+        sent in as few i2c_rdwr calls as the kernel allows) instead of one
+        write_byte per step.
+
+        Args:
+            states (bytes | Sequence[int]): Port byte per step, ie stepper phases.
+            repeat (int): Times the sequence is sent back to back.
+            chunk (int | None): Max bytes per message, see NosI2CTransaction.
+
+        Returns:
+            float: Achieved update rate in steps per second.
+
+        Notes:
+            - Inversion and input pins are applied to every step.
+            - The step rate is set by the bus clock, about 1/9 of it.
+            - The bus is held for the whole sequence. Keep it short on shared buses.
+        """
+        assert repeat > 0, "repeat must be > 0"
+        table = bytes(((v ^ 0xFF if self.__invert else v) | self.inputs) & 0xFF for v in range(256))
+        data = bytes(v & 0xFF for v in states).translate(table) * repeat
+        if not data: return 0.0
+
+        with self.locked():
+            start = time.perf_counter()
+            NosI2CTransaction(self.i2c, self.addr, chunk).write(data).submit()
+            elapsed = time.perf_counter() - start
+            self._latched(data[-1])
+        return len(data) / elapsed if elapsed > 0 else float("inf")
+
     def get_state(self, p: Union[int, None] = None) -> Union[List[bool], bool]:
         """
         Get the state of one or all pins.
@@ -110,24 +224,12 @@ class PCF8574(NosI2CDevice):
             value (bool): True for HIGH, False for LOW.
 
         Notes:
-            - Reads the current byte, modifies only the specified pin,
-              and writes the updated byte back.
+            - Modifies only the specified pin in the latch shadow and writes
+              the updated byte. No read from the port.
             - No action is taken if the pin is already at the requested state.
         """
         assert 0 <= p <= 7, "Pin number must be 0–7"
-
-        value_bool: bool = bool(value)
-        byte: int = self.read_byte()
-
-        # Set or clear the bit corresponding to pin p
-        if value_bool:
-            byte |= (1 << p)
-        else:
-            byte &= ~(1 << p)
-
-        # Only write if the value actually changed
-        if byte != self.read_byte():
-            self.write_byte(byte)
+        self.set_pins(1 << p, 0xFF if value else 0x00)
 
     # state = property(get_state, set_state)
 
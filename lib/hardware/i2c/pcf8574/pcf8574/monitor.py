@@ -0,0 +1,183 @@
+#===================================================================
+# file: monitor.py
+# desc: interrupt driven input monitor for the PCF8574. the port is
+#       only read when the INT line asserts, the new byte is diffed
+#       against the last one and per pin callbacks are fired.
+# dev : nos
+#===================================================================
+import threading
+from typing import Callable, Dict, List, Optional
+
+from i2c import NosI2CScheduler
+from i2c.sim import NosI2CSim, SimIntLine
+
+from .core import PCF8574
+
+# callback(pin, state) for one pin, callback(byte, changed) for the port
+PinCallback = Callable[[int, bool], None]
+PortCallback = Callable[[int, int], None]
+
+
+class PCF8574Monitor:
+    """
+    Input change detection on the PCF8574 INT line.
+
+    The INT output goes low when an input pin changes and is released by
+    the next port read. The monitor listens on the GPIO wired to INT and
+    reads the port once per assertion, instead of polling the bus.
+
+    Example:
+        io = PCF8574(0x20, inputs=0xF0)
+        mon = PCF8574Monitor(io, int_pin=17).start()
+        mon.add_listener(4, lambda p, s: print("P%d" % p, s))
+
+    Attributes:
+        device (PCF8574): Expander watched.
+        source: Edge source for INT. Anything shaped like pigpiod's HWGPIO:
+            add_listener(cb(source)) and a state property, False while asserted.
+        mask (int): Pins reported. Defaults to device.inputs, all pins if none.
+        last (int | None): Port byte as of the last read.
+        interrupts (int): INT assertions seen.
+        reads (int): Port reads done.
+        spurious (int): Reads that found no change on a reported pin.
+        errors (int): Services that failed, ie a bus error or a raising callback.
+        last_error (Exception | None): Error of the last failed service.
+    """
+
+    # reads per assertion before giving up on a line that stays low
+    MAX_REREADS: int = 4
+
+    def __init__(self, device: PCF8574, int_pin=None, mask: Optional[int] = None):
+        """
+        Args:
+            device (PCF8574): Expander to watch.
+            int_pin (int | HWGPIO | None): GPIO offset INT is wired to, or an
+                edge source. None uses the simulated INT line of a mock device.
+            mask (int | None): Pins to report. Defaults to device.inputs.
+
+        Notes:
+            - A GPIO offset is opened as a pulled up input through pigpiod and
+              registered with HWGPIO_MONITOR.
+        """
+        self.device: PCF8574 = device
+        self.mask: int = (mask if mask is not None else device.inputs or 0xFF) & 0xFF
+        self.source = self.__edge_source(int_pin)
+        self.last: Optional[int] = None
+        self.interrupts: int = 0
+        self.reads: int = 0
+        self.spurious: int = 0
+        self.errors: int = 0
+        self.last_error: Optional[BaseException] = None
+        self._pin_cbs: Dict[int, List[PinCallback]] = {}
+        self._port_cbs: List[PortCallback] = []
+        self._pending = threading.Lock()
+        self._running: bool = False
+        self.source.add_listener(self._on_edge)
+
+    def __edge_source(self, int_pin):
+        if int_pin is None:
+            i2c = self.device.i2c
+            model = i2c.devices.get(self.device.addr) if isinstance(i2c, NosI2CSim) else None
+            assert model is not None, "int_pin required for a real device"
+            return SimIntLine(model)
+        if not isinstance(int_pin, int):
+            return int_pin
+        # only needed with a real gpio, keep pigpiod optional
+        from pigpiod import HWGPIO, HWGPIO_MONITOR
+        pin = HWGPIO(int_pin, "in", "pull_up")
+        HWGPIO_MONITOR.add_listener(pin, self._on_edge)
+        HWGPIO_MONITOR.start()
+        return pin
+
+    # -----------------------------
+    # listeners
+    # -----------------------------
+    def add_listener(self, pin: Optional[int], callback: Callable) -> None:
+        """
+        Register a change callback.
+
+        Args:
+            pin (int | None): Pin 0-7, callback(pin, state). None for the whole
+                port, callback(byte, changed) with changed a bit mask.
+
+        Notes:
+            - Callbacks run on the bus scheduler thread and should be short.
+        """
+        if pin is None:
+            if callback not in self._port_cbs: self._port_cbs.append(callback)
+            return
+        assert 0 <= pin <= 7, "Pin number must be 0–7"
+        cbs = self._pin_cbs.setdefault(pin, [])
+        if callback not in cbs: cbs.append(callback)
+
+    def remove_listener(self, pin: Optional[int], callback: Callable) -> None:
+        """ unregister a callback added with add_listener() """
+        cbs = self._port_cbs if pin is None else self._pin_cbs.get(pin, [])
+        if callback in cbs: cbs.remove(callback)
+
+    # -----------------------------
+    # run
+    # -----------------------------
+    def start(self) -> "PCF8574Monitor":
+        """ read the port once as reference and start reacting to INT """
+        self.last = self.device.read_byte()
+        self.reads += 1
+        self._running = True
+        # changes between the reference read and now would be lost otherwise
+        if not self.source.state: self._on_edge(self.source)
+        return self
+
+    def stop(self) -> None:
+        """ stop reacting to INT. the edge source keeps running """
+        self._running = False
+
+    def _on_edge(self, source) -> None:
+        if not self._running or source.state: return
+        self.interrupts += 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        # one read per burst. an edge while a read is queued is covered by it
+        if not self._pending.acquire(blocking=False): return
+        fut = self.device.submit(self._service, priority=NosI2CScheduler.PRIO_HIGH)
+        # also runs if the job never does, ie the scheduler was stopped
+        fut.add_done_callback(self._serviced)
+
+    def _service(self) -> None:
+        for _ in range(self.MAX_REREADS):
+            self.check()
+            # INT is released by the read. still low means a new change
+            if self.source.state: break
+
+    def _serviced(self, fut) -> None:
+        self._pending.release()
+        err = None if fut.cancelled() else fut.exception()
+        if err is not None:
+            self.errors += 1
+            self.last_error = err
+        # INT asserted again after the last check, its edge was dropped while
+        # the read was pending. the line stays low, no new edge would come
+        if self._running and not self.source.state: self._dispatch()
+
+    def check(self) -> int:
+        """
+        Read the port and dispatch callbacks for changed pins.
+
+        Returns:
+            int: Changed pins as a bit mask.
+        """
+        byte = self.device.read_byte()
+        self.reads += 1
+        prev = byte if self.last is None else self.last
+        self.last = byte
+        changed = (byte ^ prev) & self.mask
+        if not changed:
+            self.spurious += 1
+            return 0
+
+        for cb in self._port_cbs: cb(byte, changed)
+        for p, cbs in self._pin_cbs.items():
+            if changed >> p & 1:
+                state = bool(byte >> p & 1)
+                for cb in cbs: cb(p, state)
+        return changed
@@ -0,0 +1,166 @@
+#===================================================================
+# file: port.py
+# desc: several PCF8574 seen as one wide port. updates are diffed per
+#       expander, only changed bytes are written, one transaction per
+#       bus and buses in parallel.
+# dev : nos
+#===================================================================
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from i2c import NosI2CDeviceGroup, NosI2CTransaction
+
+from .core import PCF8574
+
+
+class PCF8574Port:
+    """
+    Virtual port over up to 8 PCF8574.
+
+    Expander n holds bits 8n..8n+7, so with 0x20..0x27 in order P0 of
+    0x20 is bit 0 and P7 of 0x27 is bit 63.
+
+    Example:
+        port = PCF8574Port([PCF8574(a) for a in range(0x20, 0x28)])
+        port.value = 0x00FF00FF00FF00FF     # only changed expanders are written
+        port.set_state(42, True)
+
+    Attributes:
+        devices (List[PCF8574]): Expanders, least significant byte first.
+        width (int): Bits in the port.
+        parallel (bool): Run buses on their scheduler threads in parallel.
+            With one bus involved the update always runs inline.
+    """
+
+    MAX_DEVICES: int = 8
+
+    def __init__(self, devices: Sequence[PCF8574], parallel: bool = True):
+        """
+        Args:
+            devices (Sequence[PCF8574]): Expanders, least significant byte first.
+            parallel (bool): Update expanders on different buses in parallel.
+        """
+        assert 0 < len(devices) <= self.MAX_DEVICES, "1 to 8 expanders"
+        self.devices: List[PCF8574] = list(devices)
+        self.width: int = 8 * len(self.devices)
+        self.parallel: bool = parallel
+        self.group = NosI2CDeviceGroup(self.devices)
+
+    def __len__(self) -> int:
+        return self.width
+
+    @property
+    def mask(self) -> int:
+        """ all bits of the port """
+        return (1 << self.width) - 1
+
+    # -----------------------------
+    # outputs
+    # -----------------------------
+    @property
+    def value(self) -> int:
+        """ output latches as one integer. no bus access after the first sync """
+        res = 0
+        for i, d in enumerate(self.devices):
+            res |= d.latch << (8 * i)
+        return res
+
+    @value.setter
+    def value(self, value: int) -> None:
+        self.write(value)
+
+    def write(self, value: int) -> int:
+        """
+        Set every pin.
+
+        Returns:
+            int: Expanders written.
+        """
+        return self.set_pins(self.mask, value)
+
+    def set_pins(self, mask: int, values: int) -> int:
+        """
+        Set any pins of the port.
+
+        Args:
+            mask (int): Pins to change, bit per pin.
+            values (int): New levels for the pins in mask.
+
+        Returns:
+            int: Expanders written. Expanders whose byte does not change
+                are skipped, the rest is one transaction per bus.
+        """
+        per_bus: Dict[int, List[Tuple[PCF8574, int, int]]] = {}
+        for i, d in enumerate(self.devices):
+            m = mask >> (8 * i) & 0xFF
+            if not m: continue
+            part = (d, m, values >> (8 * i) & 0xFF)
+            per_bus.setdefault(id(d.i2c), []).append(part)
+        if not per_bus: return 0
+
+        if len(per_bus) == 1 or not self.parallel:
+            return sum(self._update_bus(parts) for parts in per_bus.values())
+        ops = [(parts[0][0], lambda d, parts: self._update_bus(parts), parts) for parts in per_bus.values()]
+        return sum(self.group.batch(ops))
+
+    @staticmethod
+    def _update_bus(parts: List[Tuple[PCF8574, int, int]]) -> int:
+        """ write the changed expanders of one bus in one transaction """
+        first = parts[0][0]
+        with first.locked():
+            writes = []
+            for d, m, v in parts:
+                raw = d._plan(m, v)
+                if raw is not None: writes.append((d, raw))
+            if not writes: return 0
+            t = NosI2CTransaction(first.i2c)
+            for d, raw in writes:
+                t.write([raw], addr=d.addr)
+            t.submit()
+            for d, raw in writes:
+                d._latched(raw)
+        return len(writes)
+
+    def modify(self, clear: int = 0, set: int = 0) -> int:
+        """ clear then set pins. set wins over clear """
+        return self.set_pins(clear | set, set)
+
+    def set_state(self, p: int, value: bool) -> None:
+        """ set a single pin """
+        assert 0 <= p < self.width, "Pin number out of range"
+        self.set_pins(1 << p, -1 if value else 0)
+
+    def __setitem__(self, p: int, value: bool) -> None:
+        self.set_state(p, value)
+
+    # -----------------------------
+    # inputs
+    # -----------------------------
+    def read(self) -> int:
+        """ read every expander, buses in parallel, as one integer """
+        if self.parallel and len(self.group.buses()) > 1:
+            values = self.group.call("read_byte")
+        else:
+            values = [d.read_byte() for d in self.devices]
+        res = 0
+        for i, v in enumerate(values):
+            res |= v << (8 * i)
+        return res
+
+    def get_state(self, p: Optional[int] = None) -> Union[List[bool], bool]:
+        """
+        Get the state of one or all pins.
+
+        Args:
+            p (int | None): Pin number, or None for all pins.
+
+        Returns:
+            bool | List[bool]: Level of pin p, or of every pin in bit order.
+        """
+        if p is not None:
+            assert 0 <= p < self.width, "Pin number out of range"
+            return bool(self.devices[p // 8].read_byte() >> (p % 8) & 1)
+        b = self.read()
+        return [(b >> i) & 1 == 1 for i in range(self.width)]
+
+    def __getitem__(self, p: int) -> bool:
+        return self.get_state(p)
@@ -1,2 +1,8 @@
 from .core import PCF8591
-__all__ = ["PCF8591"]
+from .sampler import PCF8591Sampler
+from .waveform import PCF8591Waveform
+from .filters import Filter, Decimate, MovingAverage, Median, EMA, Chain, FilterBank
+__all__ = [
+    "PCF8591", "PCF8591Sampler", "PCF8591Waveform",
+    "Filter", "Decimate", "MovingAverage", "Median", "EMA", "Chain", "FilterBank",
+]
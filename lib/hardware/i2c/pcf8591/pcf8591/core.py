@@ -2,17 +2,48 @@
 # PCF8591
 # desc: 4-channel ADC + 1-channel DAC combo over I2C
 #===================================================================
-from i2c import NosI2CDevice
+from array import array
+from typing import Dict, List, Optional, Union
+from i2c import NosI2CDevice, NosI2C, NosI2CScheduler, NosI2CTransaction
+from i2c.sim import NosI2CSim, SimPCF8591
+
+# numpy is optional. batch conversion falls back to array without it
+try:
+    import numpy as np  # pyright: ignore[reportMissingImports]
+    HAS_NUMPY = True
+except ImportError:
+    np = None
+    HAS_NUMPY = False
+
+# raw 8-bit sample -> percent of vref. independent of vref
+PERCENT_LUT = array("d", (v * 100 / 255 for v in range(256)))
+# vref -> raw 8-bit sample -> volts
+_VOLT_LUTS: Dict[float, array] = {}
+
+def _lookup(lut: array, raw):
+    """ map raw samples through a 256 entry table. ndarray in, ndarray out """
+    if HAS_NUMPY and isinstance(raw, np.ndarray):
+        return np.frombuffer(lut, dtype=np.float64)[raw.astype(np.uint8, copy=False)]
+    return array("d", map(lut.__getitem__, raw))
 
 class PCF8591(NosI2CDevice):
     """
     Driver for the PCF8591 4-ADC + 1-DAC I2C module.
 
     Attributes:
+        MOCK (bool): True if running without actual I2C hardware.
+            Mock devices run against the i2c simulator.
         DEF_ADDR (int): Default I2C address.
         vref (float): Reference voltage for ADC/DAC conversion.
+
+    The control byte last written is cached. Reads of the channel already
+    selected skip the select write, and every ADC read is a single
+    write+read transaction.
     """
+    MOCK: bool = not NosI2C.HAS_I2C
     DEF_ADDR: int = 0x48
+    # adc polling is background work next to servo/io updates
+    PRIORITY: int = NosI2CScheduler.PRIO_BULK
     
     # Control bytes for input channels
     CTRL_AD_CH0 = 0b00000000
@@ -30,10 +61,21 @@ class PCF8591(NosI2CDevice):
         Args:
             addr (int): I2C address. Defaults to DEF_ADDR.
             vref (float): Reference voltage (default 5V).
+
+        Notes:
+            - In MOCK mode without an explicit i2c, the device is backed by
+              a SimPCF8591 model on the simulated bus.
         """
         if addr is None:
             addr = self.DEF_ADDR
         self.vref: float = vref
+        # control byte as last written. None when unknown
+        self._ctrl: Optional[int] = None
+
+        if PCF8591.MOCK and kwargs.get("i2c") is None:
+            sim = NosI2CSim.mock(kwargs.pop("bus", 1))
+            if addr not in sim.devices: sim.attach(SimPCF8591(addr, vref))
+            kwargs["i2c"] = sim
         super().__init__(addr, **kwargs)
 
     def set_value(self, value: float | int) -> None:
@@ -42,10 +84,37 @@ class PCF8591(NosI2CDevice):
 
         Args:
             value (int | float): DAC value to set.
+
+        Notes:
+            - Sent with the cached control byte, so the ADC channel selection
+              stays valid.
         """
         # Clamp to 0–255
         value = max(0, min(255, int(value)))
-        self.i2c.write_byte_data(self.addr, 0x40, value)
+        with self.locked():
+            ctrl = self.CTRL_ANALOG_OUTPUT_ENABLE if self._ctrl is None else self._ctrl
+            self.i2c.write_byte_data(self.addr, ctrl, value)
+            self._ctrl = ctrl
+
+    def _convert(self, ctrl: int, n: int, select: bool = False) -> List[int]:
+        """
+        Select ctrl if not already (or if select) and read n fresh conversions.
+
+        The first byte read is the conversion started by the previous read,
+        so n+1 bytes are read and the first is dropped. Select and read go
+        out in one transaction.
+        """
+        with self.locked():
+            t = NosI2CTransaction(self.i2c, self.addr)
+            if select or ctrl != self._ctrl: t.write([ctrl])
+            t.read(n + 1)
+            try:
+                res = t.submit()[0]
+            except OSError:
+                self._ctrl = None
+                raise
+            self._ctrl = ctrl
+        return res[1:]
 
     def get_analog(self, ch: int) -> int:
         """
@@ -59,15 +128,47 @@ class PCF8591(NosI2CDevice):
 
         Notes:
             - The first read after switching channel returns previous value,
-              so a dummy read is performed first.
+              so an extra byte is read and dropped.
+            - One transaction. The select write is skipped if the channel is
+              already selected.
+            - With coalesce_reads() on, concurrent reads of the same channel
+              share one sequence.
         """
         assert 0 <= ch <= 3, "Channel must be 0–3"
-        # Select ADC channel
-        self.i2c.write_byte(self.addr, 0x40 + ch)
-        # Dummy read
-        self.i2c.read_byte(self.addr)
-        # Actual ADC read
-        return self.i2c.read_byte(self.addr)
+        return self.coalesced(("analog", ch), lambda: self._get_analog(ch))
+
+    def _get_analog(self, ch: int) -> int:
+        return self._convert(self.CTRL_ANALOG_OUTPUT_ENABLE | ch, 1)[0]
+
+    def get_all(self) -> List[int]:
+        """
+        Read all four ADC channels in one transaction.
+
+        Returns:
+            List[int]: 8-bit ADC value per channel [AIN0..AIN3].
+
+        Notes:
+            - Uses auto-increment. The control byte is always written since
+              the chip's channel pointer has moved on after the last read.
+        """
+        return self.coalesced(("analog", "all"), self._get_all)
+
+    def _get_all(self) -> List[int]:
+        ctrl = self.CTRL_ANALOG_OUTPUT_ENABLE | self.CTRL_INC_FLAG | self.CTRL_AD_CH0
+        # the pointer after a block read is not ch0. always select
+        return self._convert(ctrl, 4, select=True)
+
+    def get_voltages(self, r: int = 3) -> List[float]:
+        """
+        Read all four channels as voltages.
+
+        Args:
+            r (int): Number of decimal places to round.
+
+        Returns:
+            List[float]: Voltage per channel [AIN0..AIN3].
+        """
+        return [round(v * self.vref / 255, r) for v in self.get_all()]
 
     def get_voltage(self, ch: int, r: int = 3) -> float:
         """
@@ -80,9 +181,7 @@ class PCF8591(NosI2CDevice):
         Returns:
             float: Voltage corresponding to ADC value.
         """
-        adc_val = self.get_analog(ch)
-        voltage = adc_val * self.vref / 255
-        return round(voltage, r)
+        return round(self.voltage_lut()[self.get_analog(ch)], r)
     
     def get_percent(self, ch: int, r: int = 1) -> float:
         """
@@ -90,19 +189,49 @@ class PCF8591(NosI2CDevice):
 
         Args:
             ch (int): ADC channel (0–3).
-            r (int): Number of decimal places to round (default 2).
+            r (int): Number of decimal places to round (default 1).
 
         Returns:
             float: ADC value as percentage of vref (0–100%).
+
+        Notes:
+            - Computed from the raw value and rounded once.
+        """
+        return round(PERCENT_LUT[self.get_analog(ch)], r)
+
+    # -----------------------------
+    # batch conversion
+    # -----------------------------
+    def voltage_lut(self) -> array:
+        """
+        Raw value -> volts table for the current vref.
+
+        Returns:
+            array: 256 doubles, shared by every device with the same vref.
+        """
+        lut = _VOLT_LUTS.get(self.vref)
+        if lut is None:
+            lut = _VOLT_LUTS[self.vref] = array("d", (v * self.vref / 255 for v in range(256)))
+        return lut
+
+    def to_voltages(self, raw: Union[bytes, bytearray, memoryview, array, "np.ndarray"]) -> Union[array, "np.ndarray"]:
         """
-        # Get voltage from ADC channel
-        voltage = self.get_voltage(ch, r + 2)
+        Convert a batch of raw 8-bit samples to volts.
+
+        Args:
+            raw (bytes | bytearray | memoryview | array | ndarray): Raw samples,
+                ie a PCF8591Sampler view.
 
-        # Convert to percentage of vref
-        percent = (voltage / self.vref) * 100
+        Returns:
+            array | ndarray: Volts per sample, unrounded. An ndarray for ndarray input
+                (one fancy-index), else an array('d') built by the table lookup.
+        """
+        return _lookup(self.voltage_lut(), raw)
 
-        # Round to requested precision
-        return round(percent, r)
+    @staticmethod
+    def to_percents(raw: Union[bytes, bytearray, memoryview, array, "np.ndarray"]) -> Union[array, "np.ndarray"]:
+        """ like to_voltages() but in percent of vref """
+        return _lookup(PERCENT_LUT, raw)
 
 
     def set_voltage(self, volt: float) -> None:
@@ -0,0 +1,205 @@
+#===================================================================
+# file: filters.py
+# desc: streaming filters for PCF8591 readings. oversample and
+#       decimate, moving average, median and exponential smoothing,
+#       chained per channel. buffers are allocated once, push() is
+#       constant work per sample.
+# dev : nos
+#===================================================================
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Sequence
+
+
+class Filter(ABC):
+    """
+    Base for streaming filters.
+
+    push() takes one sample and returns the filtered value, or None while
+    the filter has nothing to output yet (ie between decimated outputs).
+    """
+
+    @abstractmethod
+    def push(self, x: float) -> Optional[float]:
+        """ filter one sample """
+
+    def reset(self) -> None:
+        """ forget all history """
+
+    def process(self, samples: Iterable[float]) -> array:
+        """
+        Push a block of samples, ie a sampler view.
+
+        Returns:
+            array: Outputs in order, as array('d').
+        """
+        out = array("d")
+        push = self.push
+        for x in samples:
+            y = push(x)
+            if y is not None: out.append(y)
+        return out
+
+
+class Decimate(Filter):
+    """
+    Oversample and decimate. Averages every n samples into one output.
+
+    Averaging n samples of an 8-bit ADC with some noise on the input adds
+    about log4(n) bits of resolution.
+    """
+
+    def __init__(self, n: int):
+        assert n > 0, "n must be > 0"
+        self.n: int = n
+        self.reset()
+
+    def reset(self) -> None:
+        self._sum: float = 0.0
+        self._count: int = 0
+
+    def push(self, x: float) -> Optional[float]:
+        self._sum += x
+        self._count += 1
+        if self._count < self.n: return None
+        y = self._sum / self.n
+        self._sum, self._count = 0.0, 0
+        return y
+
+
+class MovingAverage(Filter):
+    """ mean of the last n samples. ring buffer plus running sum """
+
+    def __init__(self, n: int):
+        assert n > 0, "n must be > 0"
+        self.n: int = n
+        self._ring = array("d", bytes(8 * n))
+        self.reset()
+
+    def reset(self) -> None:
+        for i in range(self.n): self._ring[i] = 0.0
+        self._sum: float = 0.0
+        self._i: int = 0
+        self._count: int = 0
+
+    def push(self, x: float) -> float:
+        self._sum += x - self._ring[self._i]
+        self._ring[self._i] = x
+        self._i = (self._i + 1) % self.n
+        if self._count < self.n: self._count += 1
+        return self._sum / self._count
+
+
+class Median(Filter):
+    """
+    Median of the last n samples. Removes spikes without smearing edges.
+
+    Keeps the window in arrival order (ring) and sorted (for the median),
+    so a sample costs a binary search and a short memmove.
+    """
+
+    def __init__(self, n: int):
+        assert n > 0, "n must be > 0"
+        self.n: int = n
+        self._ring = array("d", bytes(8 * n))
+        self.reset()
+
+    def reset(self) -> None:
+        self._sorted: List[float] = []
+        self._i: int = 0
+
+    def push(self, x: float) -> float:
+        s = self._sorted
+        if len(s) == self.n:
+            del s[bisect_left(s, self._ring[self._i])]
+        self._ring[self._i] = x
+        self._i = (self._i + 1) % self.n
+        insort(s, x)
+        k = len(s)
+        return s[k // 2] if k % 2 else (s[k // 2 - 1] + s[k // 2]) / 2
+
+
+class EMA(Filter):
+    """
+    Exponential moving average, y += alpha * (x - y).
+
+    Args:
+        alpha (float): 0 < alpha <= 1. Smaller is smoother and slower.
+    """
+
+    def __init__(self, alpha: float):
+        assert 0 < alpha <= 1, "alpha must be in (0, 1]"
+        self.alpha: float = alpha
+        self.reset()
+
+    def reset(self) -> None:
+        self._y: Optional[float] = None
+
+    def push(self, x: float) -> float:
+        if self._y is None: self._y = float(x)
+        else: self._y += self.alpha * (x - self._y)
+        return self._y
+
+
+class Chain(Filter):
+    """ filters applied in order. stops at the first stage without output """
+
+    def __init__(self, *stages: Filter):
+        self.stages: Sequence[Filter] = stages
+
+    def reset(self) -> None:
+        for f in self.stages: f.reset()
+
+    def push(self, x: float) -> Optional[float]:
+        for f in self.stages:
+            x = f.push(x)
+            if x is None: return None
+        return x
+
+
+class FilterBank:
+    """
+    One filter (or chain) per ADC channel.
+
+    Example:
+        bank = FilterBank({0: Chain(Decimate(4), Median(5)), 1: EMA(0.1)})
+        for _ in range(100):
+            bank.push(pcf.get_all())
+        print(bank.value)
+
+    Attributes:
+        filters (Dict[int, Filter]): Filter per channel.
+        value (Dict[int, float | None]): Last output per channel.
+    """
+
+    def __init__(self, filters: Dict[int, Filter]):
+        assert all(0 <= ch <= 3 for ch in filters), "Channel must be 0–3"
+        self.filters: Dict[int, Filter] = dict(filters)
+        self.value: Dict[int, Optional[float]] = {ch: None for ch in self.filters}
+
+    def reset(self) -> None:
+        for ch, f in self.filters.items():
+            f.reset()
+            self.value[ch] = None
+
+    def push(self, frame: Sequence[int]) -> Dict[int, Optional[float]]:
+        """
+        Feed one frame, ie the result of get_all().
+
+        Returns:
+            Dict[int, float | None]: New output per channel, None where the
+                filter produced none this frame.
+        """
+        res = {}
+        for ch, f in self.filters.items():
+            y = f.push(frame[ch])
+            res[ch] = y
+            if y is not None: self.value[ch] = y
+        return res
+
+    def process(self, ch: int, samples: Iterable[float]) -> array:
+        """ push a block of samples of one channel, ie a sampler view """
+        out = self.filters[ch].process(samples)
+        if len(out): self.value[ch] = out[-1]
+        return out
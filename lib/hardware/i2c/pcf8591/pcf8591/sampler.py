@@ -0,0 +1,224 @@
+#===================================================================
+# file: sampler.py
+# desc: continuous ADC sampling for the PCF8591. a thread samples at
+#       a fixed rate into preallocated ring buffers, one per channel,
+#       with a shared timestamp ring and drop/late counters.
+# dev : nos
+#===================================================================
+import threading
+import time
+from array import array
+from typing import Dict, Optional, Sequence, Tuple
+
+from i2c.grid import NosI2CGrid
+
+from .core import PCF8591
+
+
+class _Ring:
+    """ fixed size ring over an array. no allocation per sample """
+
+    def __init__(self, size: int, typecode: str):
+        self.data = array(typecode, bytes(size * array(typecode).itemsize))
+        self.size: int = size
+        self.total: int = 0
+
+    def __len__(self) -> int:
+        return min(self.total, self.size)
+
+    def append(self, v) -> None:
+        self.data[self.total % self.size] = v
+        self.total += 1
+
+    def views(self) -> Tuple[memoryview, memoryview]:
+        """ (older, newer) views in time order. the second is empty until the ring wraps """
+        mv = memoryview(self.data)
+        if self.total <= self.size: return mv[:self.total], mv[:0]
+        i = self.total % self.size
+        return mv[i:], mv[:i]
+
+
+class PCF8591Sampler:
+    """
+    Fixed rate background sampler.
+
+    Every frame reads the configured channels (one get_all() transaction
+    when more than one channel is sampled) and stores the raw 8-bit values
+    plus one timestamp. Frames run on an absolute deadline grid, so the
+    rate does not drift with bus time.
+
+    Example:
+        with PCF8591Sampler(PCF8591(), rate=200, channels=(0, 1)) as s:
+            time.sleep(1)
+            print(s.snapshot(0), s.stats())
+
+    Attributes:
+        device (PCF8591): ADC sampled.
+        rate (float): Frames per second.
+        channels (Tuple[int, ...]): Channels sampled.
+        size (int): Samples kept per channel.
+        late_after (float): Fraction of a period a frame may start late
+            before it counts as late.
+        frames (int): Frames sampled.
+        late (int): Frames started late.
+        dropped (int): Frames skipped because the sampler fell a whole period behind.
+        errors (int): Frames that failed on the bus.
+        last_error (Exception | None): Error of the last failed frame.
+    """
+
+    def __init__(self, device: PCF8591, rate: float = 100.0, channels: Sequence[int] = (0, 1, 2, 3),
+                 size: int = 1024, late_after: float = 0.5):
+        """
+        Args:
+            device (PCF8591): ADC to sample.
+            rate (float): Frames per second.
+            channels (Sequence[int]): Channels to sample, 0–3.
+            size (int): Samples kept per channel. Older samples are overwritten.
+            late_after (float): Lateness, in periods, counted as late.
+        """
+        assert rate > 0, "rate must be > 0"
+        assert size > 0, "size must be > 0"
+        assert channels and all(0 <= ch <= 3 for ch in channels), "Channel must be 0–3"
+        self.device: PCF8591 = device
+        self.rate: float = rate
+        self.channels: Tuple[int, ...] = tuple(channels)
+        self.size: int = size
+        self.late_after: float = late_after
+        self._rings: Dict[int, _Ring] = {ch: _Ring(size, "B") for ch in self.channels}
+        self._times = _Ring(size, "d")
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.frames: int = 0
+        self.late: int = 0
+        self.dropped: int = 0
+        self.errors: int = 0
+        self.last_error: Optional[BaseException] = None
+
+    def __enter__(self) -> "PCF8591Sampler":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    # -----------------------------
+    # thread
+    # -----------------------------
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> "PCF8591Sampler":
+        """ start sampling (non-blocking) """
+        if self.running: return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="pcf8591-sampler-%#x" % self.device.addr)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """ stop sampling. buffers are kept """
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _run(self) -> None:
+        grid = NosI2CGrid(1.0 / self.rate)
+        while grid.wait(self._stop.wait):
+            if grid.begin() > self.late_after * grid.period: self.late += 1
+            self.sample()
+            self.dropped += grid.end()
+
+    def sample(self) -> bool:
+        """
+        Take one frame now.
+
+        Returns:
+            bool: False if the bus read failed.
+        """
+        try:
+            if len(self.channels) == 1:
+                values = {self.channels[0]: self.device.get_analog(self.channels[0])}
+            else:
+                values = self.device.get_all()
+        except OSError as e:
+            self.errors += 1
+            self.last_error = e
+            return False
+        t = time.monotonic()
+        with self._lock:
+            for ch, ring in self._rings.items():
+                ring.append(values[ch])
+            self._times.append(t)
+            self.frames += 1
+        return True
+
+    # -----------------------------
+    # data
+    # -----------------------------
+    def view(self, ch: int) -> Tuple[memoryview, memoryview]:
+        """
+        Raw samples of a channel without copying.
+
+        Returns:
+            Tuple[memoryview, memoryview]: (older, newer) parts in time order.
+                The second part is empty until the ring wrapped.
+
+        Notes:
+            - The views alias the ring. Sampling keeps writing into them,
+              stop() first or copy if a stable snapshot is needed.
+        """
+        return self._rings[ch].views()
+
+    def times(self) -> Tuple[memoryview, memoryview]:
+        """ monotonic timestamps per frame, laid out like view() """
+        return self._times.views()
+
+    def latest(self, ch: int) -> Optional[int]:
+        """ newest raw sample of a channel, None before the first frame """
+        ring = self._rings[ch]
+        if not ring.total: return None
+        return ring.data[(ring.total - 1) % ring.size]
+
+    def snapshot(self, ch: int) -> Dict[str, float]:
+        """
+        Statistics over the samples currently held for a channel.
+
+        Returns:
+            Dict[str, float]: {"n", "min", "max", "mean"} in raw units, or
+                only {"n": 0} before the first frame.
+        """
+        with self._lock:
+            a, b = self._rings[ch].views()
+            n = len(a) + len(b)
+            if not n: return {"n": 0}
+            parts = [p for p in (a, b) if len(p)]
+            return {
+                "n": n,
+                "min": min(min(p) for p in parts),
+                "max": max(max(p) for p in parts),
+                "mean": (sum(a) + sum(b)) / n,
+            }
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Sampling health.
+
+        Returns:
+            Dict[str, float]: {"frames", "late", "dropped", "errors", "rate",
+                "last_error"}. rate is the achieved frame rate over the buffer.
+        """
+        with self._lock:
+            a, b = self._times.views()
+            n = len(a) + len(b)
+            first = a[0] if n else 0.0
+            last = (b[-1] if len(b) else a[-1]) if n else 0.0
+        return {
+            "frames": self.frames,
+            "late": self.late,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "rate": (n - 1) / (last - first) if n > 1 and last > first else 0.0,
+            "last_error": self.last_error,
+        }
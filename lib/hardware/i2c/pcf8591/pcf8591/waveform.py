@@ -0,0 +1,221 @@
+#===================================================================
+# file: waveform.py
+# desc: DAC waveform player for the PCF8591. samples go out as short
+#       multi-sample writes clocked by the bus, paced on an absolute
+#       deadline grid, with the bus free between writes.
+# dev : nos
+#===================================================================
+import itertools
+import threading
+import time
+from typing import Dict, Iterable, Iterator, Optional, Union
+
+from i2c import NosI2CTransaction
+
+from .core import PCF8591
+
+Samples = Union[bytes, bytearray, memoryview, Iterable[int]]
+
+
+class PCF8591Waveform:
+    """
+    Stream a waveform to the DAC.
+
+    The chip updates the DAC on every data byte after the control byte.
+    Each sample is repeated ``hold`` times so it lasts one sample period
+    on the wire, and a chunk of samples is one write clocked by the bus.
+    Chunks are short and paced against absolute deadlines. The bus lock
+    is released between chunks, so other devices get in.
+
+    When playback falls behind, the samples already late are dropped and
+    counted, so the rest of the waveform keeps its timing instead of
+    being squeezed into a burst.
+
+    With ``pad=False`` every sample is its own write, paced by sleeping.
+    The bus is almost idle, but every sample costs an ioctl.
+
+    Example:
+        sine = bytes(int(127.5 + 127.5 * math.sin(2 * math.pi * i / 100)) for i in range(100))
+        wave = PCF8591Waveform(PCF8591(), sine, rate=1000, loop=True).start()
+
+    Attributes:
+        device (PCF8591): DAC driven.
+        rate (float): Target samples per second.
+        loop (bool): Restart a buffer when it ends.
+        pad (bool): Multi-sample writes clocked by the bus (default), else
+            one write per sample.
+        chunk (int): Max DAC bytes per write.
+        hold (int): Bus bytes per sample. 1 unless padded.
+        samples (int): Samples sent.
+        chunks (int): Writes done.
+        underruns (int): Samples dropped because playback fell behind.
+        errors (int): Failed writes.
+        last_error (Exception | None): Error of the last failed write.
+    """
+
+    # bus clocks per data byte: 8 bits + ack
+    CLOCKS_PER_BYTE: int = 9
+
+    def __init__(self, device: PCF8591, samples: Samples, rate: float, loop: bool = False,
+                 chunk: int = 64, pad: bool = True, bus_freq: Optional[int] = None):
+        """
+        Args:
+            device (PCF8591): DAC to drive.
+            samples (bytes | Iterable[int]): Sample buffer, or any iterable /
+                generator of 0–255 values.
+            rate (float): Target samples per second.
+            loop (bool): Repeat the buffer. Buffers only, not generators.
+            chunk (int): Max DAC bytes per write. Bigger is fewer ioctls,
+                smaller lets other bus traffic in sooner. 64 bytes hold the
+                bus about 6ms at 100 kHz.
+            pad (bool): Repeat samples on the wire so a write plays at rate.
+                False sends one sample per write.
+            bus_freq (int | None): Bus clock in Hz, used to derive hold.
+                Defaults to the bus's freq.
+        """
+        assert rate > 0, "rate must be > 0"
+        assert 0 < chunk < NosI2CTransaction.MAX_LEN, "chunk must be 1..8191"
+        self.device: PCF8591 = device
+        self.rate: float = rate
+        self.loop: bool = loop
+        self.pad: bool = pad
+        self.hold: int = 1
+        if pad:
+            if bus_freq is None: bus_freq = getattr(device.i2c, "freq", None) or 100_000
+            self.hold = max(1, int(bus_freq / self.CLOCKS_PER_BYTE / rate))
+        # keep whole samples per chunk
+        self.chunk: int = max(1, chunk // self.hold) * self.hold
+
+        self._buffer: Optional[bytes] = None
+        self._source: Optional[Iterator[int]] = None
+        self._pos: int = 0
+        if isinstance(samples, (bytes, bytearray, memoryview, list, tuple)):
+            self._buffer = bytes(v & 0xFF for v in samples)
+            assert self._buffer, "no samples"
+        else:
+            assert not loop, "loop needs a buffer, not a generator"
+            self._source = iter(samples)
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.samples: int = 0
+        self.chunks: int = 0
+        self.underruns: int = 0
+        self.errors: int = 0
+        self.last_error: Optional[BaseException] = None
+        self._start: Optional[float] = None
+        self._end: Optional[float] = None
+
+    # -----------------------------
+    # source
+    # -----------------------------
+    def _take(self, n: int) -> bytes:
+        """ next n samples or fewer at the end. empty when done """
+        if self._source is not None:
+            return bytes(v & 0xFF for v in itertools.islice(self._source, n))
+        buf = self._buffer
+        part = buf[self._pos:self._pos + n]
+        self._pos += len(part)
+        while self.loop and len(part) < n:
+            more = buf[:n - len(part)]
+            part += more
+            self._pos = len(more)
+        return part
+
+    def _padded(self, part: bytes) -> bytes:
+        if self.hold == 1: return part
+        return bytes(itertools.chain.from_iterable(itertools.repeat(v, self.hold) for v in part))
+
+    # -----------------------------
+    # run
+    # -----------------------------
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> "PCF8591Waveform":
+        """ play on a background thread (non-blocking) """
+        if self.running: return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.play, daemon=True, name="pcf8591-wave-%#x" % self.device.addr)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """ stop playing. the DAC keeps the last sample """
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """ wait for a non looping waveform to end. False on timeout """
+        if self._thread is not None: self._thread.join(timeout)
+        return not self.running
+
+    def play(self) -> None:
+        """
+        Play in the calling thread until the samples end or stop().
+
+        Notes:
+            - Returns once the last sample has had its full period, so
+              waveforms played back to back keep the rate.
+        """
+        dev = self.device
+        period = 1.0 / self.rate
+        self._start = deadline = time.monotonic()
+        self._end = None
+        self._pos = 0
+        per_write = self.chunk // self.hold if self.pad else 1
+        while True:
+            wait = deadline - time.monotonic()
+            if wait > 0:
+                if self._stop.wait(wait): break
+            elif -wait >= period:
+                # fell behind. drop the samples whose time has passed, stay on the grid
+                late = len(self._take(int(-wait / period)))
+                self.underruns += late
+                deadline += late * period
+            if self._stop.is_set(): break
+            part = self._take(per_write)
+            if not part: break
+            try:
+                self._write(dev, self._padded(part))
+            except OSError as e:
+                self.errors += 1
+                self.last_error = e
+            self.samples += len(part)
+            self.chunks += 1
+            deadline += len(part) * period
+        if not self._stop.is_set():
+            # the last sample plays for a whole period too
+            self._stop.wait(max(0.0, deadline - time.monotonic()))
+        self._end = time.monotonic()
+
+    @staticmethod
+    def _write(dev: PCF8591, data: bytes) -> None:
+        # cached control byte keeps the ADC channel selection, as set_value().
+        # the bus lock is only held for this one write
+        with dev.locked():
+            ctrl = dev.CTRL_ANALOG_OUTPUT_ENABLE if dev._ctrl is None else dev._ctrl
+            NosI2CTransaction(dev.i2c, dev.addr).write(bytes([ctrl]) + data).submit()
+            dev._ctrl = ctrl
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Playback health.
+
+        Returns:
+            Dict[str, float]: {"samples", "chunks", "underruns", "errors", "hold",
+                "rate"}. rate is the achieved samples per second over the
+                whole playback, the last sample's period included.
+        """
+        elapsed = 0.0
+        if self._start is not None: elapsed = (self._end or time.monotonic()) - self._start
+        return {
+            "samples": self.samples,
+            "chunks": self.chunks,
+            "underruns": self.underruns,
+            "errors": self.errors,
+            "hold": self.hold,
+            "rate": self.samples / elapsed if elapsed > 0 else 0.0,
+        }